@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from benchmarks.generate_ledger import generate_ledger, parse_size
+from benchmarks.intent_parser_benchmark import load_corpus, DEFAULT_CORPUS
+from benchmarks.ledger_benchmark import RETRIEVAL_QUERIES, latency_stats, timed_calls, environment
+from modules.embedding_cache import normalize_rows
+from modules.embedding_model import EncodeSettings, PRECISIONS, QUERY
+from modules.intent_parser import parse_intent
+from modules.rag_engine import RAGEngine
+
+def benchmark_queries(corpus):
+    """Canonical queries of the corpus utterances plus the free-form
+    retrieval queries, without duplicates"""
+    queries = [intent['query'] for intent in map(parse_intent, corpus) if intent['intent'] != 'exit']
+    return list(dict.fromkeys(queries + RETRIEVAL_QUERIES))
+
+def build_engine(ledger_path, index_dir, precision):
+    """(engine, seconds to embed the ledger from scratch)"""
+    started = time.perf_counter()
+    engine = RAGEngine(ledger_path, force_reload=True, index_dir=index_dir, answer_cache_size=0,
+                       embedding_precision=precision)
+    return engine, time.perf_counter() - started
+
+def retrieval_agreement(baseline, candidate, queries, k):
+    """How closely candidate's top-k chunks and answers match baseline's"""
+    expected = baseline.retrieve_many(queries, top_k=k)
+    actual = candidate.retrieve_many(queries, top_k=k)
+    overlap = [len(set(want) & set(got)) / max(len(want), 1) for (want, _), (got, _) in zip(expected, actual)]
+    top1 = [bool(want) and bool(got) and want[0] == got[0] for (want, _), (got, _) in zip(expected, actual)]
+    answers = [baseline.get_answer(query) == candidate.get_answer(query) for query in queries]
+
+    base_vectors = normalize_rows(baseline.embedding_model.encode(queries))
+    vectors = normalize_rows(candidate.embedding_model.encode(queries))
+    rows = min(len(baseline.chunk_embeddings), len(candidate.chunk_embeddings))
+    index_cosine = np.einsum('ij,ij->i', np.asarray(baseline.chunk_embeddings[:rows], dtype=np.float32),
+                             np.asarray(candidate.chunk_embeddings[:rows], dtype=np.float32))
+    return {
+        f'overlap_at_{k}': float(np.mean(overlap)),
+        'top1_agreement': float(np.mean(top1)),
+        'answer_agreement': float(np.mean(answers)),
+        'query_cosine_mean': float(np.mean(np.einsum('ij,ij->i', base_vectors, vectors))),
+        'index_cosine_mean': float(index_cosine.mean()),
+        'index_cosine_min': float(index_cosine.min()) if rows else 1.0,
+    }
+
+def query_latency(model, queries, threads):
+    """Single-query encode latency at a given intra-op thread count"""
+    default = model.settings[QUERY]
+    model.settings[QUERY] = EncodeSettings(default.batch_size, threads)
+    try:
+        model.encode(queries[:1])
+        latencies, elapsed = timed_calls(lambda query: model.encode([query]), queries)
+    finally:
+        model.settings[QUERY] = default
+    return latency_stats(latencies, elapsed)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare retrieval with a quantized embedding model against the fp32 baseline on a synthetic ledger.")
+    parser.add_argument("--size", default="20k", help="ledger lines: 1k, 20k, 100k, ...")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--precision", default='int8', choices=[precision for precision in PRECISIONS if precision != 'fp32'])
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="utterances whose canonical queries are compared")
+    parser.add_argument("--query-threads", default="1,2,4", help="comma-separated thread counts to time query encoding with")
+    parser.add_argument("--min-overlap", type=float, default=0.9,
+                        help="exit with status 1 if overlap@k falls below this")
+    parser.add_argument("-o", "--output", default="embedding_accuracy.json", help="JSON results file")
+    parser.add_argument("--work-dir", help="where to write the ledger and indexes (default: system temp)")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="embedding_accuracy_", dir=args.work_dir)
+    try:
+        ledger_path = generate_ledger(os.path.join(work_dir, "statements.txt"), parse_size(args.size), seed=args.seed)
+        baseline, baseline_build = build_engine(ledger_path, os.path.join(work_dir, "fp32"), 'fp32')
+        candidate, candidate_build = build_engine(ledger_path, os.path.join(work_dir, args.precision), args.precision)
+        queries = benchmark_queries(load_corpus(args.corpus))
+
+        report = {
+            'environment': environment(),
+            'config': vars(args),
+            'chunks': len(baseline.chunks),
+            'queries': len(queries),
+            'accuracy': retrieval_agreement(baseline, candidate, queries, args.k),
+            'build_seconds': {'fp32': baseline_build, args.precision: candidate_build},
+            'query_encode': {},
+        }
+        for threads in (int(value) for value in args.query_threads.split(',')):
+            for name, engine in (('fp32', baseline), (args.precision, candidate)):
+                report['query_encode'][f"{name}_threads_{threads}"] = query_latency(engine.embedding_model, queries, threads)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    accuracy = report['accuracy']
+    print(f"{report['chunks']:,} chunks, {report['queries']} queries, {args.precision} vs fp32")
+    for name, value in accuracy.items():
+        print(f"  {name:<20} {value:8.4f}")
+    for name, seconds in report['build_seconds'].items():
+        print(f"  build {name:<14} {seconds:8.2f} s")
+    for name, stats in report['query_encode'].items():
+        print(f"  encode {name:<22} {stats['p50_ms']:8.3f} ms p50  (p99 {stats['p99_ms']:.3f} ms)")
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if accuracy[f'overlap_at_{args.k}'] < args.min_overlap:
+        print(f"overlap@{args.k} is below --min-overlap {args.min_overlap}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
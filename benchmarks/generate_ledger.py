@@ -0,0 +1,104 @@
+import argparse
+from datetime import date
+import numpy as np
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000, '10m': 10000000}
+
+# (description, typical amount), in the style of data/financial_statements.txt
+EXPENSES = [
+    ("Office Rent", 550), ("Internet Bill", 65), ("Cloud Storage Subscription", 12),
+    ("Co-working Space Fee", 120), ("Graphic Design Software", 25), ("Office Supplies", 45),
+    ("Freelance Web Design Payment", 1200), ("Phone Bill", 85), ("Adobe Creative Cloud", 55),
+    ("Online Course Subscription", 50), ("Business Lunch", 75), ("Printer Ink", 40),
+    ("QuickBooks Subscription", 30), ("Domain Renewal", 18), ("Software License Renewal", 200),
+    ("Marketing Materials", 120), ("Food Delivery", 30), ("Tax Consultant Fee", 250),
+    ("LinkedIn Premium", 35), ("Client Gifts", 90), ("Coffee Supplies", 25), ("New Laptop", 950),
+    ("Conference Tickets", 300), ("Electricity Bill", 95), ("Equipment Purchase", 650),
+    ("Travel Expenses", 400), ("Insurance Premium", 180), ("Bank Fees", 15),
+]
+INCOMES = [
+    ("Website Project", 3500), ("Monthly Retainer", 2000), ("E-commerce Site", 5000),
+    ("Logo Design", 600), ("SEO Audit", 900), ("Mobile App Prototype", 4200),
+    ("Maintenance Contract", 750), ("Consulting Session", 300),
+]
+OTHER_INCOMES = [("Blog Ad Revenue", 450), ("Freelance Writing", 800), ("Affiliate Commission", 120)]
+CLIENTS = [f"Client {chr(letter)}" for letter in range(ord('A'), ord('Z') + 1)]
+
+INCOME_SHARE = 0.15
+CHUNK_LINES = 100000
+
+def parse_size(size):
+    """Line count for "1k", "100k", "1m", "10m" or a plain number"""
+    size = size.strip().lower()
+    if size in SIZES:
+        return SIZES[size]
+    multiplier = {'k': 1000, 'm': 1000000}.get(size[-1:], 1)
+    return int(size.rstrip('km')) * multiplier
+
+def generate_lines(lines, seed=0, start=date(2022, 1, 1), years=3):
+    """Yield a deterministic synthetic ledger of `lines` Invoice/Income lines.
+
+    Dates advance evenly over `years` years from `start`, so every month
+    is populated and the file is in date order; descriptions, record types
+    and amounts are drawn from a seeded generator in fixed-size chunks, so
+    the same arguments always produce the same file.
+    """
+    rng = np.random.default_rng(seed)
+    first_day = start.toordinal()
+    span = date(start.year + years, start.month, start.day).toordinal() - first_day
+    dates = [date.fromordinal(first_day + day).strftime('%B %d, %Y') for day in range(span)]
+    width = max(3, len(str(lines)))
+
+    invoice_id = 0
+    income_id = 0
+    for chunk_start in range(0, lines, CHUNK_LINES):
+        count = min(CHUNK_LINES, lines - chunk_start)
+        days = (np.arange(chunk_start, chunk_start + count, dtype=np.int64) * span // lines).tolist()
+        is_income = (rng.random(count) < INCOME_SHARE).tolist()
+        expense_choice = rng.integers(len(EXPENSES), size=count).tolist()
+        income_choice = rng.integers(len(INCOMES) + len(OTHER_INCOMES), size=count).tolist()
+        client_choice = rng.integers(len(CLIENTS), size=count).tolist()
+        scale = rng.lognormal(0.0, 0.35, size=count).tolist()
+
+        for day, income, expense_index, income_index, client_index, factor in zip(
+                days, is_income, expense_choice, income_choice, client_choice, scale):
+            if income:
+                income_id += 1
+                if income_index < len(INCOMES):
+                    description, amount = INCOMES[income_index]
+                    description = f"{CLIENTS[client_index]} - {description}"
+                else:
+                    description, amount = OTHER_INCOMES[income_index - len(INCOMES)]
+                yield f"Income #{income_id:0{width}d} | {dates[day]} | {description} | ${max(1, round(amount * factor))}\n"
+            else:
+                invoice_id += 1
+                description, amount = EXPENSES[expense_index]
+                yield f"Invoice #{invoice_id:0{width}d} | {dates[day]} | {description} | ${max(1, round(amount * factor))}\n"
+
+def generate_ledger(path, lines, seed=0, start=date(2022, 1, 1), years=3):
+    """Write a synthetic ledger file (see generate_lines) and return its path"""
+    with open(path, 'w') as file:
+        batch = []
+        for line in generate_lines(lines, seed, start, years):
+            batch.append(line)
+            if len(batch) >= CHUNK_LINES:
+                file.writelines(batch)
+                batch = []
+        file.writelines(batch)
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic financial statement file.")
+    parser.add_argument("size", help="number of lines: 1k, 100k, 1m, 10m or a plain number")
+    parser.add_argument("-o", "--output", help="output file (default: ledger_<size>.txt)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--years", type=int, default=3, help="years of data, starting January 2022")
+    args = parser.parse_args()
+
+    lines = parse_size(args.size)
+    path = args.output or f"ledger_{args.size}.txt"
+    generate_ledger(path, lines, seed=args.seed, years=args.years)
+    print(f"Wrote {lines} lines to {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import time
+import argparse
+from benchmarks import legacy_intent_parser
+from modules.intent_parser import parse_intent, classify
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "utterances.txt")
+
+def load_corpus(path):
+    with open(path, "r") as file:
+        return [line.strip() for line in file if line.strip()]
+
+def throughput(parser, utterances, rounds):
+    """Best-of-rounds utterances per second"""
+    best = None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for utterance in utterances:
+            parser(utterance)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(utterances) / best
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the compiled intent classifier with the legacy keyword parser.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="file with one utterance per line")
+    parser.add_argument("--size", type=int, default=100000, help="utterances per timed round (corpus is repeated)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--show-diffs", action="store_true", help="list utterances the parsers disagree on")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    utterances = (corpus * (args.size // len(corpus) + 1))[:args.size]
+
+    results = [
+        ("legacy parse_intent", throughput(legacy_intent_parser.parse_intent, utterances, args.rounds)),
+        ("parse_intent", throughput(parse_intent, utterances, args.rounds)),
+        ("classify", throughput(classify, utterances, args.rounds)),
+    ]
+    baseline = results[0][1]
+    print(f"{len(corpus)} distinct utterances, {len(utterances)} per round, best of {args.rounds}")
+    for name, rate in results:
+        print(f"  {name:<20} {rate:>12,.0f} utterances/s  {rate / baseline:5.2f}x")
+
+    diffs = [(text, legacy_intent_parser.parse_intent(text), parse_intent(text)) for text in corpus]
+    diffs = [diff for diff in diffs if diff[1] != diff[2]]
+    print(f"Agreement with legacy parser: {len(corpus) - len(diffs)}/{len(corpus)}")
+    if args.show_diffs:
+        for text, legacy, current in diffs:
+            print(f"  {text!r}\n    legacy: {legacy}\n    now:    {current}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime, timezone
+import numpy as np
+from benchmarks.generate_ledger import generate_ledger, parse_size
+from benchmarks.intent_parser_benchmark import load_corpus, DEFAULT_CORPUS
+from modules.data_preprocessor import preprocess_financial_data
+from modules.intent_parser import parse_intent, classify
+from modules.rag_engine import RAGEngine
+from modules.embedding_model import PRECISIONS
+
+DEFAULT_SIZES = "1k,100k"
+DEFAULT_EMBED_MAX_LINES = 100000
+
+# Free-form questions that go through retrieval rather than the ledger
+RETRIEVAL_QUERIES = [
+    "cloud storage", "how much was the new laptop", "conference tickets", "office rent payments",
+    "client a website project", "phone and internet bills", "tax consultant", "blog ad revenue",
+    "marketing materials cost", "monthly retainer from client b",
+]
+
+class StageTimedEngine(RAGEngine):
+    """RAGEngine that records how long each part of a cold load takes.
+
+    With embed=False the load stops after chunking, for ledgers too large
+    to embed in a benchmark run.
+    """
+
+    def __init__(self, file_path, index_dir, embed=True, **kwargs):
+        self.timings = {}
+        self.embed = embed
+        super().__init__(file_path, force_reload=True, index_dir=index_dir, **kwargs)
+
+    def _load_and_chunk_document(self, file_path, ends=None):
+        started = time.perf_counter()
+        result = super()._load_and_chunk_document(file_path, ends)
+        self.timings['chunk'] = time.perf_counter() - started
+        return result
+
+    def _add_summary_chunks(self, ledger, chunks):
+        started = time.perf_counter()
+        super()._add_summary_chunks(ledger, chunks)
+        self.timings['summaries'] = time.perf_counter() - started
+
+    def _load(self, force_reload=False):
+        started = time.perf_counter()
+        if not self.embed:
+            self.ledger, self.chunks = self._load_and_chunk_document(self.file_path)
+            self._add_summary_chunks(self.ledger, self.chunks)
+        else:
+            self.embedding_model.load()
+            self.timings['model_load'] = time.perf_counter() - started
+            super()._load(force_reload)
+            # Encoding, quantizing and writing the index to disk
+            self.timings['embed'] = (time.perf_counter() - started - self.timings['model_load']
+                                     - self.timings['chunk'] - self.timings['summaries'])
+        self.timings['cold_start'] = time.perf_counter() - started
+
+def latency_stats(latencies, elapsed=None):
+    """Summary of per-call latencies given in seconds"""
+    latencies = np.asarray(latencies, dtype=np.float64) * 1000
+    stats = {
+        'count': len(latencies),
+        'mean_ms': float(latencies.mean()),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'max_ms': float(latencies.max()),
+    }
+    if elapsed:
+        stats['per_second'] = len(latencies) / elapsed
+    return stats
+
+def timed_calls(function, arguments):
+    """Call function once per argument, returning (latencies, total seconds)"""
+    latencies = []
+    started = time.perf_counter()
+    for argument in arguments:
+        call_started = time.perf_counter()
+        function(argument)
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def concurrent_load(engine, utterances, concurrency, requests):
+    """Answer utterances from `concurrency` threads as the voice loop does
+    (classify, then answer), with the answer cache disabled"""
+    queries = [intent['query'] for intent in map(parse_intent, utterances) if intent['intent'] != 'exit']
+    queries = (queries * (requests // len(queries) + 1))[:requests]
+
+    def answer(query):
+        started = time.perf_counter()
+        engine.get_answer(parse_intent(query)['query'])
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(answer, queries))
+    stats = latency_stats(latencies, time.perf_counter() - started)
+    stats['concurrency'] = concurrency
+    return stats
+
+def run_size(lines, args):
+    """Benchmark every stage for one ledger size; runs in its own process so
+    peak RSS is per size"""
+    work_dir = tempfile.mkdtemp(prefix=f"ledger_{lines}_", dir=args.work_dir)
+    try:
+        stages = {}
+        ledger_path = os.path.join(work_dir, "statements.txt")
+        started = time.perf_counter()
+        generate_ledger(ledger_path, lines, seed=args.seed)
+        stages['generate'] = {'seconds': time.perf_counter() - started}
+
+        started = time.perf_counter()
+        preprocess_financial_data(ledger_path, os.path.join(work_dir, "processed.json"))
+        stages['preprocess_financial_data'] = {'seconds': time.perf_counter() - started}
+
+        embed = lines <= args.embed_max_lines
+        index_dir = os.path.join(work_dir, "rag_index")
+        engine = StageTimedEngine(ledger_path, index_dir, embed=embed, answer_cache_size=0,
+                                  embedding_dtype=args.embedding_dtype, embedding_precision=args.embedding_precision)
+        for name, seconds in engine.timings.items():
+            stages[name] = {'seconds': seconds}
+        result = {'lines': lines, 'chunks': len(engine.chunks), 'file_bytes': os.path.getsize(ledger_path)}
+
+        utterances = load_corpus(args.corpus)
+        latencies, elapsed = timed_calls(parse_intent, (utterances * (args.intents // len(utterances) + 1))[:args.intents])
+        stages['parse_intent'] = latency_stats(latencies, elapsed)
+
+        if embed:
+            started = time.perf_counter()
+            engine = RAGEngine(ledger_path, index_dir=index_dir, answer_cache_size=0, embedding_dtype=args.embedding_dtype,
+                               embedding_precision=args.embedding_precision)
+            stages['cache_load'] = {'seconds': time.perf_counter() - started}
+            engine.embedding_model.load()
+
+            queries = (RETRIEVAL_QUERIES * (args.queries // len(RETRIEVAL_QUERIES) + 1))[:args.queries]
+            contexts = {}
+            def retrieve(query):
+                contexts[query] = engine.retrieve(query, top_k=5)[0]
+            latencies, elapsed = timed_calls(retrieve, queries)
+            stages['retrieve'] = latency_stats(latencies, elapsed)
+
+            intents = {query: classify(query) for query in queries}
+            latencies, elapsed = timed_calls(lambda query: engine.format_answer(query, contexts[query], intents[query]), queries)
+            stages['format_answer'] = latency_stats(latencies, elapsed)
+
+            if args.concurrency:
+                result['concurrent'] = concurrent_load(engine, utterances, args.concurrency, args.requests)
+        else:
+            result['skipped'] = f"embedding stages skipped above --embed-max-lines {args.embed_max_lines}"
+
+        result['stages'] = stages
+        result['peak_rss_mb'] = peak_rss_mb()
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def headline(stage):
+    """(value, unit) used to print and compare a stage"""
+    if 'seconds' in stage:
+        return stage['seconds'], 's'
+    return stage['p50_ms'], 'ms p50'
+
+def print_result(result, baseline=None):
+    print(f"{result['lines']:,} lines, {result['chunks']:,} chunks, peak RSS {result['peak_rss_mb']:.0f} MB")
+    stages = dict(result['stages'])
+    if 'concurrent' in result:
+        stages['concurrent'] = result['concurrent']
+    for name, stage in stages.items():
+        value, unit = headline(stage)
+        line = f"  {name:<26} {value:>10.3f} {unit}"
+        if 'p99_ms' in stage:
+            line += f"  (p99 {stage['p99_ms']:.3f} ms)"
+        previous = (baseline or {}).get(name)
+        if previous is not None and headline(previous)[0]:
+            line += f"  {value / headline(previous)[0]:5.2f}x vs baseline"
+        print(line)
+    if 'skipped' in result:
+        print(f"  ({result['skipped']})")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the ledger pipeline on synthetic ledgers.")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated ledger sizes, e.g. 1k,100k,1m,10m")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-max-lines", type=int, default=DEFAULT_EMBED_MAX_LINES,
+                        help="largest ledger to embed; bigger ones stop after chunking")
+    parser.add_argument("--embedding-dtype", default='float32', choices=('float32', 'float16', 'int8'))
+    parser.add_argument("--embedding-precision", default='fp32', choices=PRECISIONS, help="model inference precision")
+    parser.add_argument("--queries", type=int, default=200, help="retrieve/format_answer calls per size")
+    parser.add_argument("--intents", type=int, default=20000, help="parse_intent calls per size")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads for the concurrent load (0 to skip)")
+    parser.add_argument("--requests", type=int, default=1000, help="requests in the concurrent load")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="utterances for parse_intent and the concurrent load")
+    parser.add_argument("--work-dir", help="where to write the generated ledgers (default: system temp)")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            for result in json.load(file)['results']:
+                stages = dict(result['stages'])
+                if 'concurrent' in result:
+                    stages['concurrent'] = result['concurrent']
+                baseline[result['lines']] = stages
+
+    report = {'environment': environment(), 'config': vars(args), 'results': []}
+    context = multiprocessing.get_context('spawn')
+    for size in args.sizes.split(','):
+        lines = parse_size(size)
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_size, lines, args).result()
+        report['results'].append(result)
+        print_result(result, baseline.get(lines))
+
+        # Written after every size so a long run leaves partial results
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+    print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,4 @@
 import streamlit as st
-import speech_recognition as sr
-from gtts import gTTS
 import tempfile
 import os
 from io import BytesIO
@@ -8,12 +6,30 @@ import base64
 from modules.intent_parser import parse_intent
 from modules.finance_api import execute_action
 from modules.rag_engine import get_rag_answer
+from modules.query_client import query_server
+from modules.tts_cache import get_tts_cache
+from modules.recognizer import load_recognizer, transcribe_wav
+from modules.tracing import get_tracer
+
+def answer_query(text):
+    """Answer through the query server when one is running, else in-process"""
+    response = query_server(text)
+    if response is not None:
+        intent_data = response["intent"]
+        if intent_data["intent"] == "query_financial_docs":
+            return response["answer"]
+    else:
+        intent_data = parse_intent(text)
+
+    if intent_data["intent"] == "query_financial_docs":
+        return get_rag_answer(intent_data["query"])
+    return execute_action(intent_data)
 
-def autoplay_audio(audio_bytes):
+def autoplay_audio(audio_bytes, mime_type):
     b64 = base64.b64encode(audio_bytes).decode()
     html = f"""
         <audio autoplay="true">
-            <source src="data:audio/mp3;base64,{b64}" type="audio/mp3">
+            <source src="data:{mime_type};base64,{b64}" type="{mime_type}">
         </audio>
     """
     st.markdown(html, unsafe_allow_html=True)
@@ -34,7 +50,13 @@ for key in ["audio_recording", "audio_filename", "transcript", "response", "audi
     if key not in st.session_state:
         st.session_state[key] = None if "filename" in key else False if "should_autoplay" in key else ""
 
+def synthesize_speech(text):
+    with get_tracer().stage("tts"):
+        return get_tts_cache().audio_bytes(text)
+
 def record_audio(duration=5):
+    import speech_recognition as sr
+
     try:
         filename = tempfile.mktemp(suffix=".wav")
         with st.spinner(f"🎙️ Recording for {duration} seconds..."):
@@ -49,25 +71,21 @@ def record_audio(duration=5):
         st.error(f"Error recording audio: {str(e)}")
         return None
 
-def process_audio_file(file_path):
+def process_audio_file(source):
+    """Transcribe and answer a .wav path or in-memory file object"""
+    tracer = get_tracer()
     try:
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(file_path) as source:
-            audio_data = recognizer.record(source)
-            transcript = recognizer.recognize_google(audio_data)
-
-        intent_data = parse_intent(transcript)
-        if intent_data["intent"] == "query_financial_docs":
-            result = get_rag_answer(intent_data["query"])
-        else:
-            result = execute_action(intent_data)
+        with tracer.trace("gui_audio"):
+            with tracer.stage("asr"):
+                transcript = transcribe_wav(load_recognizer(), source)
+            if not transcript:
+                return None, "Could not recognize any speech in the audio.", None
 
-        tts = gTTS(text=result)
-        audio_bytes_io = BytesIO()
-        tts.write_to_fp(audio_bytes_io)
-        audio_bytes_io.seek(0)
+            tracer.annotate(command=transcript)
+            with tracer.stage("answer"):
+                result = answer_query(transcript)
 
-        return transcript, result, audio_bytes_io.getvalue()
+            return transcript, result, synthesize_speech(result)
     except Exception as e:
         return None, f"Error processing audio: {str(e)}", None
 
@@ -103,20 +121,14 @@ text_query = st.text_input("Type your query here:")
 if st.button("📩 Submit Text Query") and text_query:
     with st.spinner("Processing your question..."):
         try:
-            intent_data = parse_intent(text_query)
-            if intent_data["intent"] == "query_financial_docs":
-                result = get_rag_answer(intent_data["query"])
-            else:
-                result = execute_action(intent_data)
-
-            tts = gTTS(text=result)
-            audio_bytes_io = BytesIO()
-            tts.write_to_fp(audio_bytes_io)
-            audio_bytes_io.seek(0)
+            with get_tracer().trace("gui_text", command=text_query):
+                with get_tracer().stage("answer"):
+                    result = answer_query(text_query)
+                audio_response = synthesize_speech(result)
 
             st.session_state.transcript = text_query
             st.session_state.response = result
-            st.session_state.audio_response = audio_bytes_io.getvalue()
+            st.session_state.audio_response = audio_response
             st.session_state.should_autoplay = True
         except Exception as e:
             st.error(f"❌ Error: {str(e)}")
@@ -136,31 +148,23 @@ if st.session_state.transcript or st.session_state.response:
 
     if st.session_state.audio_response:
         if st.session_state.should_autoplay:
-            autoplay_audio(st.session_state.audio_response)
+            autoplay_audio(st.session_state.audio_response, get_tts_cache().mime_type)
             st.session_state.should_autoplay = False
         else:
-            st.audio(st.session_state.audio_response, format="audio/mp3")
+            st.audio(st.session_state.audio_response, format=get_tts_cache().mime_type)
 
 st.markdown("---")
 st.markdown("### 📂 Upload an Audio File")
 uploaded_file = st.file_uploader("Upload a .wav file", type=['wav'])
 if uploaded_file:
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.wav')
-    temp_file.write(uploaded_file.getvalue())
-    temp_file.close()
-
     if st.button("📤 Process Uploaded File"):
         with st.spinner("Processing uploaded audio..."):
-            transcript, response, audio_response = process_audio_file(temp_file.name)
+            transcript, response, audio_response = process_audio_file(BytesIO(uploaded_file.getvalue()))
             if transcript:
                 st.session_state.transcript = transcript
                 st.session_state.response = response
                 st.session_state.audio_response = audio_response
                 st.session_state.should_autoplay = True
-                try:
-                    os.remove(temp_file.name)
-                except:
-                    pass
             else:
                 st.error("❌ Failed to process uploaded audio")
 
@@ -1,11 +1,15 @@
 print("🛠️  Initializing AI Finance Agent... Please wait.")  
 import os
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
 from modules.voice_input import get_voice_command
+from modules.recognizer import BargeInVAD
 from modules.intent_parser import parse_intent
 from modules.finance_api import execute_action
-from modules.speech_output import speak_text
+from modules.speech_output import speak_text, stop_speaking, is_speaking
+from modules.tts_cache import prerender_in_background
+from modules.query_client import server_available, query_server
+from modules.tracing import get_tracer
 
 class OutputSuppressor:
     def __enter__(self):
@@ -21,31 +25,102 @@ class OutputSuppressor:
         sys.stderr.close()
         sys.stderr = self._original_stderr
 
+USE_SERVER = server_available()
+
 with OutputSuppressor():
     from modules.rag_engine import initialize_rag, get_rag_answer
-    initialize_rag()
+    if not USE_SERVER:
+        # Opening a built index does not need the embedding model; it is
+        # loaded in the background while the first command is captured, and
+        # aggregate questions are answered from the ledger without it.
+        engine = initialize_rag()
+        engine.warm_up_in_background()
+        prerender_in_background(engine)
 
 print("✅ Initialization complete!")
 
+def answer_command(command):
+    """Answer through the query server when one is running, else in-process"""
+    response = query_server(command) if USE_SERVER else None
+    if response is not None:
+        intent_data = response["intent"]
+        if intent_data["intent"] == "query_financial_docs":
+            return response["answer"]
+    else:
+        intent_data = parse_intent(command)
+
+    with OutputSuppressor():
+        if intent_data["intent"] == "query_financial_docs":
+            return get_rag_answer(intent_data["query"])
+        return execute_action(intent_data)
+
+def answer_financial_query(text):
+    """Answer a financial-docs utterance without redirecting output, so it
+    is safe to run off the main thread"""
+    response = query_server(text) if USE_SERVER else None
+    if response is not None:
+        return response["answer"]
+    return get_rag_answer(parse_intent(text)["query"])
+
+class SpeculativeAnswerer:
+    """Starts answering from partial transcripts while the user is still
+    speaking, and reuses that answer if the final transcript matches"""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculative-answer")
+        self.reset()
+
+    def reset(self):
+        self._text = None
+        self._future = None
+
+    def update(self, partial):
+        text = " ".join(partial.lower().split())
+        if not text or text == self._text:
+            return
+        if self._future is not None and not self._future.done():
+            return
+        if parse_intent(partial)["intent"] != "query_financial_docs":
+            return
+        self._text = text
+        self._future = self.executor.submit(answer_financial_query, partial)
+
+    def take(self, command):
+        """The speculative answer for command, or None if there is none"""
+        future, text = self._future, self._text
+        self.reset()
+        if future is None or " ".join(command.lower().split()) != text:
+            return None
+        try:
+            return future.result()
+        except Exception:
+            return None
+
 def main():
+    tracer = get_tracer()
+    speculator = SpeculativeAnswerer()
+    # Listening resumes while the answer is still playing; only speech
+    # louder than the playback can interrupt it.
+    vad = BargeInVAD(is_speaking)
     while True:
-        command = get_voice_command()
-        
-        if not command:
-            continue
-            
-        intent_data = parse_intent(command)
-        
-        with OutputSuppressor():
-            if intent_data["intent"] == "query_financial_docs":
-                result = get_rag_answer(intent_data["query"])
-            else:
-                result = execute_action(intent_data)
+        with tracer.trace("voice_command"):
+            with tracer.stage("asr_capture"):
+                command = get_voice_command(on_partial=speculator.update, vad=vad)
+
+            if not command:
+                speculator.reset()
+                continue
+
+            # A new command interrupts whatever is still being spoken.
+            stop_speaking()
+            with tracer.stage("answer"):
+                speculative = speculator.take(command)
+                result = speculative or answer_command(command)
+            tracer.annotate(command=command, speculative=speculative is not None, server=USE_SERVER)
 
         print(f"💬 Response: {result}")
-        speak_text(result)
+        speak_text(result, block=False)
 
-        time.sleep(1)
         print("\n🎤 Listening for next command...")
         print("\n🟡 Or, press any key to close the agent!")
         
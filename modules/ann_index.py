@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import argparse
+import importlib
+import numpy as np
+from modules.embedding_cache import EmbeddingCache, ledger_fingerprint, normalize_rows
+
+INDEX_VERSION = 1
+DEFAULT_NPROBE = 16
+TRAIN_ROWS_PER_LIST = 64
+MAX_TRAIN_ROWS = 262144
+ASSIGN_BLOCK_ROWS = 65536
+RETRAIN_FACTOR = 2
+
+def _top_columns(scores, k):
+    """Column indices of the k highest scores in each row, unordered"""
+    k = min(k, scores.shape[1])
+    if k == scores.shape[1]:
+        return np.broadcast_to(np.arange(k), scores.shape)
+    return np.argpartition(scores, -k, axis=1)[:, -k:]
+
+def assign_rows(embeddings, centroids, block_rows=ASSIGN_BLOCK_ROWS):
+    """Index of the most similar centroid for every row, computed in blocks
+    so memory-mapped matrices are streamed rather than loaded whole"""
+    assignment = np.empty(len(embeddings), dtype=np.int32)
+    for start in range(0, len(embeddings), block_rows):
+        block = np.asarray(embeddings[start:start + block_rows], dtype=np.float32)
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+def train_centroids(embeddings, nlist, iterations=10, seed=0, train_rows=None):
+    """Spherical k-means on a random sample of the (normalized) rows"""
+    rng = np.random.default_rng(seed)
+    train_rows = train_rows or min(MAX_TRAIN_ROWS, TRAIN_ROWS_PER_LIST * nlist)
+    sample = np.sort(rng.choice(len(embeddings), size=min(len(embeddings), train_rows), replace=False))
+    data = np.asarray(embeddings[sample], dtype=np.float32)
+
+    centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_rows(data, centroids)
+        order = np.argsort(assignment, kind='stable')
+        counts = np.bincount(assignment, minlength=nlist)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        filled = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[filled] = np.add.reduceat(data[order], starts[filled], axis=0)
+        # Lists that lost all their rows restart from random sample rows
+        empty = np.flatnonzero(~filled)
+        sums[empty] = data[rng.choice(len(data), size=len(empty), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+class IVFIndex:
+    """Inverted-file (IVF-flat) index over normalized chunk embeddings.
+
+    The rows are clustered around nlist centroids by spherical k-means and
+    each row is filed under its nearest centroid, with the vectors of each
+    list stored contiguously so a list is scored with one matrix product. A
+    query only scores the lists of its nprobe nearest centroids. Raising
+    nprobe trades speed for recall, and can be changed at any time without
+    rebuilding.
+    """
+
+    name = "ivf"
+
+    def __init__(self, nlist=None, nprobe=DEFAULT_NPROBE, iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None
+        self.rows = None
+        self.offsets = None
+        self.vectors = None
+
+    def build(self, embeddings, previous=None, vectors_path=None):
+        """Cluster and file the rows of embeddings.
+
+        The centroids of a previous IVFIndex of the same dimension are
+        reused, which skips training when the store is only rewritten with
+        a few more rows. They are retrained once the list count this size
+        calls for is more than RETRAIN_FACTOR times off from theirs, so
+        lists do not grow without bound as the ledger does.
+
+        With vectors_path the list-ordered copy of the vectors is written
+        there as a memory-mapped .npy instead of being held in memory.
+        """
+        size = len(embeddings)
+        nlist = min(size, self.nlist or max(1, int(np.sqrt(size))))
+        if (isinstance(previous, IVFIndex) and previous.centroids is not None
+                and previous.centroids.shape[1] == embeddings.shape[1] and len(previous.centroids) <= size
+                and len(previous.centroids) <= nlist * RETRAIN_FACTOR and nlist <= len(previous.centroids) * RETRAIN_FACTOR):
+            centroids = previous.centroids
+        else:
+            centroids = train_centroids(embeddings, nlist, self.iterations, self.seed)
+
+        assignment = assign_rows(embeddings, centroids)
+        rows = np.argsort(assignment, kind='stable').astype(np.int64)
+
+        shape = (size, embeddings.shape[1])
+        if vectors_path is None:
+            vectors = np.empty(shape, dtype=np.float32)
+        else:
+            vectors = np.lib.format.open_memmap(vectors_path, mode='w+', dtype=np.float32, shape=shape)
+        for start in range(0, size, ASSIGN_BLOCK_ROWS):
+            block_rows = rows[start:start + ASSIGN_BLOCK_ROWS]
+            vectors[start:start + len(block_rows)] = embeddings[block_rows]
+
+        self.centroids = centroids
+        self.rows = rows
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))])
+        self.vectors = vectors
+        return self
+
+    def search(self, queries, k):
+        """Row indices of the (up to) k best rows for each normalized query,
+        unordered"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        probes = _top_columns(queries @ self.centroids.T, self.nprobe)
+        rows, offsets, vectors = self.rows, self.offsets, self.vectors
+
+        results = []
+        for query, query_probes in zip(queries, probes):
+            spans = [(offsets[probe], offsets[probe + 1]) for probe in query_probes]
+            scores = np.concatenate([vectors[start:end] @ query for start, end in spans])
+            candidates = np.concatenate([rows[start:end] for start, end in spans])
+            results.append(candidates[_top_columns(scores[None, :], k)[0]])
+        return results
+
+    def _paths(self, directory):
+        return {name: os.path.join(directory, f"ivf_{name}.npy") for name in ('centroids', 'rows', 'offsets', 'vectors')}
+
+    def save(self, directory, source):
+        """Persist next to the embedding store; source identifies the matrix
+        the index was built from"""
+        os.makedirs(directory, exist_ok=True)
+        for name, path in self._paths(directory).items():
+            array = getattr(self, name)
+            if isinstance(array, np.memmap) and array.filename:
+                # Written in place by build(vectors_path=...)
+                array.flush()
+                if os.path.abspath(array.filename) != os.path.abspath(path):
+                    os.replace(array.filename, path)
+                continue
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(path + '.tmp', path)
+
+        meta_path = os.path.join(directory, "ivf.json")
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'version': INDEX_VERSION, 'source': source, 'nlist': len(self.centroids)}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def load(self, directory, source):
+        """Restore a saved index if it was built from source; returns whether
+        it was"""
+        try:
+            with open(os.path.join(directory, "ivf.json"), 'r') as f:
+                meta = json.load(f)
+            if meta.get('version') != INDEX_VERSION or meta.get('source') != source:
+                return False
+            arrays = {name: np.load(path, mmap_mode='r') for name, path in self._paths(directory).items()}
+        except (OSError, ValueError):
+            return False
+
+        self.centroids = np.asarray(arrays['centroids'])
+        self.offsets = np.asarray(arrays['offsets'])
+        self.rows = arrays['rows']
+        self.vectors = arrays['vectors']
+        return True
+
+def load_ann_index(spec=None, nprobe=None):
+    """Build an ANN index from "ivf" or "package.module:Factory", or None for
+    exact search when spec is empty or "exact". Defaults to
+    FINANCE_AGENT_ANN, with nprobe from FINANCE_AGENT_ANN_NPROBE.
+
+    A Factory returns any object with build(embeddings, previous=None,
+    vectors_path=None), search(queries, k), save(directory, source) and
+    load(directory, source).
+    """
+    spec = spec if spec is not None else os.environ.get("FINANCE_AGENT_ANN", "")
+    if spec in ("", "exact"):
+        return None
+    if spec == "ivf":
+        index = IVFIndex()
+    elif ":" in spec:
+        module_name, _, attribute = spec.partition(":")
+        index = getattr(importlib.import_module(module_name), attribute)()
+    else:
+        raise ValueError(f"Unknown ANN index: {spec}")
+
+    nprobe = nprobe or os.environ.get("FINANCE_AGENT_ANN_NPROBE")
+    if nprobe:
+        index.nprobe = int(nprobe)
+    return index
+
+def exact_top_k(embeddings, queries, k, block_rows=ASSIGN_BLOCK_ROWS):
+    """Brute-force top-k rows per query, as sets, for measuring recall"""
+    best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+    best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+    for start in range(0, len(embeddings), block_rows):
+        block = np.asarray(embeddings[start:start + block_rows], dtype=np.float32)
+        scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+        rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(block)), (len(queries), len(block)))], axis=1)
+        keep = _top_columns(scores, k)
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_rows = np.take_along_axis(rows, keep, axis=1)
+    return [set(rows.tolist()) for rows in best_rows]
+
+def recall_at_k(index, embeddings, queries, k=5, exact=None):
+    """Mean fraction of the exact top-k rows that the index also returns"""
+    queries = normalize_rows(queries)
+    exact = exact if exact is not None else exact_top_k(embeddings, queries, k)
+    found = [set(rows.tolist()) for rows in index.search(queries, k)]
+    return float(np.mean([len(truth & result) / max(1, len(truth)) for truth, result in zip(exact, found)]))
+
+def sample_queries(embeddings, count, noise=0.5, seed=0):
+    """Query vectors near randomly chosen rows: each row plus Gaussian noise
+    of the given norm relative to it, so the row itself is not a trivial hit"""
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(embeddings), size=min(count, len(embeddings)), replace=False))
+    base = np.asarray(embeddings[rows], dtype=np.float32)
+    perturbation = normalize_rows(rng.standard_normal(base.shape).astype(np.float32)) * noise
+    return normalize_rows(base + perturbation)
+
+def main():
+    from modules.rag_engine import EMBEDDING_MODEL_NAME
+    from modules.embedding_model import LazyEmbeddingModel
+
+    parser = argparse.ArgumentParser(description="Measure IVF recall@k against brute force on the embedding store.")
+    parser.add_argument("--index-dir", default=os.path.join(os.path.dirname(os.path.dirname(__file__)), "data/rag_index"))
+    parser.add_argument("--nlist", type=int, help="number of lists (default: sqrt of the row count)")
+    parser.add_argument("--nprobe", default="1,2,4,8,16,32,64", help="comma-separated nprobe values to try")
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--texts", help="file of real queries (one per line) to encode instead of perturbed rows")
+    parser.add_argument("--noise", type=float, default=0.5, help="perturbation of sampled query rows")
+    args = parser.parse_args()
+
+    model = LazyEmbeddingModel(EMBEDDING_MODEL_NAME)
+    cache = EmbeddingCache(args.index_dir, model.cache_name)
+    if cache.sidecar is None:
+        print(f"No embedding store in {args.index_dir}; start the agent once to build it.")
+        return
+    embeddings = cache._open_embeddings(cache.sidecar['rows'])
+
+    if args.texts:
+        with open(args.texts, 'r') as f:
+            texts = [line.strip() for line in f if line.strip()]
+        queries = normalize_rows(model.encode(texts))
+    else:
+        queries = sample_queries(embeddings, args.queries, args.noise)
+
+    source = ledger_fingerprint(cache.embeddings_path)
+    index = IVFIndex(nlist=args.nlist)
+    started = time.perf_counter()
+    if args.nlist or not index.load(args.index_dir, source):
+        index.build(embeddings)
+    print(f"{len(embeddings):,} rows, {len(index.centroids):,} lists, index ready in {time.perf_counter() - started:.1f}s")
+
+    exact = exact_top_k(embeddings, queries, args.k)
+    started = time.perf_counter()
+    for query in queries:
+        exact_top_k(embeddings, query[None, :], args.k)
+    exact_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"  brute force        {exact_ms:8.3f} ms/query")
+
+    for nprobe in (int(value) for value in args.nprobe.split(',')):
+        index.nprobe = nprobe
+        recall = recall_at_k(index, embeddings, queries, args.k, exact)
+        # One query at a time, as the agent searches
+        started = time.perf_counter()
+        for query in queries:
+            index.search(query, args.k)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+        print(f"  nprobe={nprobe:<4}  recall@{args.k} {recall:6.3f}  {elapsed_ms:8.3f} ms/query  {exact_ms / elapsed_ms:6.1f}x")
+
+if __name__ == "__main__":
+    main()
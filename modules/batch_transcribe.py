@@ -0,0 +1,127 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from modules.recognizer import load_recognizer, transcribe_wav
+from modules.intent_parser import parse_intent
+
+AUDIO_PATTERNS = ('*.wav',)
+ANSWER_BATCH_SIZE = 64
+
+_recognizer = None
+
+def resolve_audio_files(source):
+    """Expand a .wav file, a directory of recordings or a glob pattern into
+    a sorted list of paths"""
+    if os.path.isdir(source):
+        paths = []
+        for pattern in AUDIO_PATTERNS:
+            paths.extend(glob.glob(os.path.join(source, '**', pattern), recursive=True))
+    elif glob.has_magic(source):
+        paths = glob.glob(source, recursive=True)
+    else:
+        paths = [source]
+
+    paths = sorted(set(paths))
+    if not paths:
+        raise FileNotFoundError(f"No audio files found for {source}")
+    return paths
+
+def _init_worker(asr_spec):
+    global _recognizer
+    _recognizer = load_recognizer(asr_spec)
+
+def transcribe_file(path):
+    """Transcribe one recording, decoding it from an in-memory buffer"""
+    started = time.perf_counter()
+    result = {'file': path, 'transcript': None, 'intent': None, 'answer': None, 'error': None}
+    try:
+        with open(path, 'rb') as f:
+            audio = io.BytesIO(f.read())
+        result['transcript'] = transcribe_wav(_recognizer, audio)
+    except Exception as e:
+        result['error'] = str(e)
+    result['timings'] = {'transcribe': time.perf_counter() - started}
+    return result
+
+def answer_batch(results):
+    """Fill in intent and answer for a batch of transcription results.
+
+    Financial-docs queries are answered together through the query server
+    when one is running, else with one batched retrieval call in-process.
+    """
+    from modules.rag_engine import get_rag_answers
+    from modules.finance_api import execute_action
+    from modules.query_client import query_server_batch
+
+    started = time.perf_counter()
+    pending = []
+    for result in results:
+        if not result['transcript']:
+            continue
+        intent_data = parse_intent(result['transcript'])
+        result['intent'] = intent_data
+        if intent_data['intent'] == 'query_financial_docs':
+            pending.append(result)
+        elif intent_data['intent'] != 'exit':
+            result['answer'] = execute_action(intent_data)
+
+    if pending:
+        queries = [result['intent']['query'] for result in pending]
+        answers = query_server_batch(queries) or get_rag_answers(queries)
+        for result, answer in zip(pending, answers):
+            result['answer'] = answer
+
+    elapsed = (time.perf_counter() - started) / max(1, len(results))
+    for result in results:
+        result['timings']['answer'] = elapsed
+    return results
+
+def run_batch(paths, output, asr_spec=None, max_workers=None, batch_size=ANSWER_BATCH_SIZE):
+    """Transcribe recordings across a process pool, answer them in batches
+    and write one JSON line per recording to output, in input order"""
+    written = 0
+    batch = []
+
+    def flush():
+        nonlocal written
+        for result in answer_batch(batch):
+            result['timings']['total'] = result['timings']['transcribe'] + result['timings']['answer']
+            output.write(json.dumps(result) + "\n")
+        output.flush()
+        written += len(batch)
+        batch.clear()
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(asr_spec,)) as executor:
+        for result in executor.map(transcribe_file, paths, chunksize=4):
+            batch.append(result)
+            if len(batch) >= batch_size:
+                flush()
+    if batch:
+        flush()
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and answer a batch of recorded voice queries.")
+    parser.add_argument("source", help="a .wav file, a directory of recordings or a glob pattern")
+    parser.add_argument("-o", "--output", help="JSONL file to write (default: stdout)")
+    parser.add_argument("--asr", help='recognizer: "google" or "vosk:/path/to/model" (default: FINANCE_AGENT_ASR)')
+    parser.add_argument("--workers", type=int, help="transcription processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=ANSWER_BATCH_SIZE, help="queries answered per retrieval batch")
+    args = parser.parse_args()
+
+    paths = resolve_audio_files(args.source)
+    started = time.perf_counter()
+    if args.output:
+        with open(args.output, "w") as output:
+            written = run_batch(paths, output, args.asr, args.workers, args.batch_size)
+    else:
+        written = run_batch(paths, sys.stdout, args.asr, args.workers, args.batch_size)
+    print(f"Processed {written} recordings in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import os
+import re
+import json
+import threading
+
+DEFAULT_RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data/categories.json")
+DEFAULT_CATEGORY = 'other'
+MAX_CACHED_DESCRIPTIONS = 1 << 20
+
+def _alternation(keywords):
+    return "|".join(re.escape(keyword.lower()) for keyword in sorted(keywords, key=len, reverse=True))
+
+def compile_rules(categories):
+    """Compile {category: [keywords]} into one anchored pattern.
+
+    Each category is a lookahead over the whole description, tried in rule
+    order, and an empty named group records which one matched. The first
+    category with any keyword anywhere in the description wins, exactly as
+    checking the categories one after another would.
+    """
+    names = list(categories)
+    branches = [rf'(?=.*?(?:{_alternation(keywords)}))(?P<c{index}>)'
+                for index, keywords in enumerate(categories.values()) if keywords]
+    if not branches:
+        return re.compile(r'(?!)', re.DOTALL), names
+    return re.compile("(?:" + "|".join(branches) + ")", re.DOTALL), names
+
+class Categorizer:
+    """Keyword rules for expense and income descriptions, compiled once.
+
+    Results are cached per distinct description as written, since vendor
+    and client names repeat heavily; matching itself ignores case. Each
+    casing of a name takes its own cache entry, which keeps a cache hit
+    free of a lower() call. categorize_many() only matches each distinct
+    description in a batch once.
+    """
+
+    def __init__(self, rules, default=DEFAULT_CATEGORY, max_cached=MAX_CACHED_DESCRIPTIONS):
+        self.default = default
+        self.max_cached = max_cached
+        self._matchers = {kind: compile_rules(rules.get(kind, {})) for kind in ('expense', 'income')}
+        self._cache = {'expense': {}, 'income': {}}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_RULES_FILE):
+        """Load rules from a JSON file of the form
+        {"default": ..., "expense": {category: [keywords]}, "income": {...}}"""
+        with open(path, 'r') as f:
+            config = json.load(f)
+        return cls(config, config.get('default', DEFAULT_CATEGORY))
+
+    def _match(self, kind, description):
+        pattern, names = self._matchers[kind]
+        match = pattern.match(description.lower())
+        if match is None:
+            return self.default
+        return names[int(match.lastgroup[1:])]
+
+    def categorize(self, kind, description):
+        """Category of one description; kind is "expense" or "income" """
+        cache = self._cache[kind]
+        category = cache.get(description)
+        if category is None:
+            category = self._match(kind, description)
+            with self._lock:
+                if len(cache) >= self.max_cached:
+                    cache.clear()
+                cache[description] = category
+        return category
+
+    def categorize_many(self, kind, descriptions):
+        """Categories for a batch of descriptions (any iterable, e.g. a list,
+        NumPy array or pandas Series), as a list in input order"""
+        descriptions = list(descriptions)
+        categories = {description: self.categorize(kind, description) for description in dict.fromkeys(descriptions)}
+        return [categories[description] for description in descriptions]
+
+_categorizer = None
+_categorizer_lock = threading.Lock()
+
+def get_categorizer():
+    """Process-wide Categorizer loaded from FINANCE_AGENT_CATEGORIES or
+    data/categories.json"""
+    global _categorizer
+    if _categorizer is None:
+        with _categorizer_lock:
+            if _categorizer is None:
+                _categorizer = Categorizer.from_file(os.environ.get("FINANCE_AGENT_CATEGORIES", DEFAULT_RULES_FILE))
+    return _categorizer
@@ -0,0 +1,155 @@
+import os
+import json
+import numpy as np
+from modules.string_columns import TextArena, grow, save_array, save_json
+
+TEXT = 0
+
+# Chunk templates rendered from ledger rows; the template of a row is
+# 1 + 3 * kind + (LINE, ID_CHUNK or DATE_CHUNK). LINE reproduces the
+# statement line itself.
+RECORD_TEMPLATES = (
+    None,
+    "Invoice #{id} | {date} | {description} | ${amount}",
+    "Invoice #{id} is for {description} costing ${amount}",
+    "{description} expense of ${amount} on {date}",
+    "Income #{id} | {date} | {description} | ${amount}",
+    "Income #{id} is from {description} earning ${amount}",
+    "{description} income of ${amount} on {date}",
+)
+LINE = 0
+ID_CHUNK = 1
+DATE_CHUNK = 2
+
+def render(ledger, template, row):
+    """Text of a templated chunk for a ledger row"""
+    return RECORD_TEMPLATES[template].format(
+        id=ledger.ids[row], date=ledger.dates[row], description=ledger.descriptions[row], amount=ledger.amount[row]
+    )
+
+class ChunkStore:
+    """Chunk texts in retrieval order, without a Python string per chunk.
+
+    Each entry is a (template, ref) pair. Template TEXT means ref indexes a
+    TextArena of literal text (summaries, and statement lines that do not
+    match their record's canonical form); any other template is rendered
+    from row ref of the ledger when the chunk is read. Templated entries
+    therefore cost 5 bytes instead of a ~100-byte string, and reading a
+    chunk always returns str, so the store can stand in for a list.
+    """
+
+    def __init__(self, ledger=None, arena=None, templates=None, refs=None):
+        self.ledger = ledger
+        self.arena = TextArena() if arena is None else arena
+        self._templates = np.zeros(0, dtype=np.int8) if templates is None else templates
+        self._refs = np.zeros(0, dtype=np.int32) if refs is None else refs
+        self._size = len(self._templates)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("ChunkStore index out of range")
+        template = self._templates[index]
+        if template == TEXT:
+            return self.arena[self._refs[index]]
+        return render(self.ledger, template, int(self._refs[index]))
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield self[index]
+
+    @property
+    def templates(self):
+        return self._templates[:self._size]
+
+    @property
+    def refs(self):
+        return self._refs[:self._size]
+
+    def _add(self, templates, refs):
+        count = len(refs)
+        self._templates = grow(self._templates, self._size + count)
+        self._refs = grow(self._refs, self._size + count)
+        self._templates[self._size:self._size + count] = templates
+        self._refs[self._size:self._size + count] = refs
+        self._size += count
+
+    def append(self, text):
+        self.extend([text])
+
+    def extend(self, texts):
+        """Add literal text chunks"""
+        first = self.arena.extend(texts)
+        self._add(TEXT, np.arange(first, len(self.arena)))
+
+    def add_lines(self, lines, records, first_row):
+        """Add statement lines in order. records are the parsed records of
+        those lines, in the same order, stored from ledger row first_row on;
+        a record line equal to its canonical form is kept as a reference
+        to that row, anything else as text."""
+        templates = np.zeros(len(lines), dtype=np.int8)
+        refs = np.zeros(len(lines), dtype=np.int32)
+        texts = []
+        position = 0
+        for index, line in enumerate(lines):
+            record = records[position] if position < len(records) else None
+            if record is not None and record.line == line:
+                template = 1 + 3 * (record.type == 'income')
+                if RECORD_TEMPLATES[template].format(id=record.id, date=record.date, description=record.description,
+                                                     amount=record.amount) == line:
+                    templates[index] = template
+                    refs[index] = first_row + position
+                    position += 1
+                    continue
+                position += 1
+            refs[index] = len(self.arena) + len(texts)
+            texts.append(line)
+        self.arena.extend(texts)
+        self._add(templates, refs)
+
+    def add_records(self, rows):
+        """Add the ID and date chunks of each ledger row, row by row"""
+        rows = np.asarray(rows, dtype=np.int32)
+        base = 1 + 3 * self.ledger.kind[rows].astype(np.int8)
+        self._add(np.stack([base + ID_CHUNK, base + DATE_CHUNK], axis=1).ravel(), np.repeat(rows, 2))
+
+    def extend_store(self, other):
+        """Append the entries of another store over the same ledger"""
+        offset = self.arena.extend(other.arena)
+        templates = other.templates
+        self._add(templates, np.where(templates == TEXT, other.refs + offset, other.refs))
+
+    def take(self, entries):
+        """New store with the given entries, sharing this store's arena"""
+        return ChunkStore(self.ledger, self.arena, self.templates[entries], self.refs[entries])
+
+    def save(self, directory, prefix="chunks", tag=None):
+        """Write the store under directory; tag is checked by load()"""
+        base = os.path.join(directory, prefix)
+        self.arena.save(f"{base}_arena")
+        save_array(f"{base}_templates.npy", self.templates)
+        save_array(f"{base}_refs.npy", self.refs)
+        save_json(f"{base}.json", {'chunks': len(self), 'tag': tag})
+
+    @classmethod
+    def load(cls, directory, ledger, prefix="chunks", tag=None):
+        """Store written by save() with the same tag, or None. The arena is
+        memory-mapped."""
+        base = os.path.join(directory, prefix)
+        try:
+            with open(f"{base}.json", 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('tag') != tag:
+                return None
+            arena = TextArena.load(f"{base}_arena")
+            templates = np.load(f"{base}_templates.npy")
+            refs = np.load(f"{base}_refs.npy")
+        except (OSError, ValueError, KeyError):
+            return None
+        if not len(templates) == len(refs) == manifest.get('chunks'):
+            return None
+        return cls(ledger, arena, templates, refs)
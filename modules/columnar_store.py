@@ -0,0 +1,145 @@
+import os
+import glob
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+from modules.ledger import Ledger, EXPENSE, INCOME
+from modules.string_columns import EncodedStrings, FixedWidthStrings
+
+FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+
+PARTITIONING = ds.partitioning(pa.schema([('year', pa.int16()), ('month', pa.int8())]), flavor='hive')
+
+LEDGER_SCHEMA = pa.schema([
+    ('row', pa.int64()),
+    ('type', pa.dictionary(pa.int8(), pa.string())),
+    ('id', pa.string()),
+    ('date', pa.date32()),
+    ('year', pa.int16()),
+    ('month', pa.int8()),
+    ('description', pa.string()),
+    ('amount', pa.int64()),
+    ('category', pa.dictionary(pa.int16(), pa.string())),
+])
+
+KIND_NAMES = ['expense', 'income']
+
+def ledger_table(ledger):
+    """Arrow table of a Ledger with typed date/amount columns and
+    dictionary-encoded type and category columns"""
+    size = len(ledger)
+    undated = ledger.month == 0
+    return pa.table({
+        'row': pa.array(np.arange(size, dtype=np.int64)),
+        'type': pa.DictionaryArray.from_arrays(pa.array(ledger.kind, pa.int8()), KIND_NAMES),
+        'id': pa.array(ledger.ids.array).cast(pa.string()),
+        'date': pa.array(ledger.day, pa.int32(), mask=undated).cast(pa.date32()),
+        'year': pa.array(ledger.year, pa.int16()),
+        'month': pa.array(ledger.month, pa.int8()),
+        'description': pa.DictionaryArray.from_arrays(
+            pa.array(ledger.descriptions.codes, pa.int32()), pa.array(ledger.descriptions.values, pa.string())
+        ).cast(pa.string()),
+        'amount': pa.array(ledger.amount, pa.int64()),
+        'category': pa.DictionaryArray.from_arrays(pa.array(ledger.category, pa.int16()), ledger.category_names),
+    }, schema=LEDGER_SCHEMA)
+
+def write_ledger(ledger, root, output_format='parquet'):
+    """Write a Ledger as a dataset partitioned by year/month (hive layout,
+    e.g. root/year=2024/month=3/part-0.parquet). Arrow IPC files are written
+    uncompressed."""
+    if output_format not in FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+
+    file_format = ds.ParquetFileFormat() if output_format == 'parquet' else ds.IpcFileFormat()
+    ds.write_dataset(
+        ledger_table(ledger),
+        root,
+        format=file_format,
+        partitioning=PARTITIONING,
+        basename_template="part-{i}" + FORMATS[output_format],
+        existing_data_behavior='delete_matching'
+    )
+    return root
+
+def _detect_format(root):
+    for output_format, suffix in FORMATS.items():
+        if glob.glob(os.path.join(root, '**', '*' + suffix), recursive=True):
+            return output_format
+    raise FileNotFoundError(f"No ledger dataset found in {root}")
+
+def open_dataset(root, output_format=None):
+    """Open a dataset written by write_ledger, with year/month partition columns"""
+    output_format = output_format or _detect_format(root)
+    return ds.dataset(root, format='parquet' if output_format == 'parquet' else 'ipc', partitioning=PARTITIONING)
+
+def load_table(root, columns=None, years=None, months=None, output_format=None):
+    """Read only the requested columns from the year/month partitions that
+    match years and months (iterables, or None for all), in ledger order"""
+    dataset = open_dataset(root, output_format)
+
+    condition = None
+    if years is not None:
+        condition = ds.field('year').isin(list(years))
+    if months is not None:
+        month_condition = ds.field('month').isin(list(months))
+        condition = month_condition if condition is None else condition & month_condition
+
+    read_columns = None if columns is None else list(dict.fromkeys(['row'] + list(columns)))
+    table = dataset.to_table(columns=read_columns, filter=condition)
+    table = table.sort_by('row')
+    if columns is not None and 'row' not in columns:
+        table = table.drop_columns(['row'])
+    return table
+
+def _encoded_strings(column):
+    """EncodedStrings from an Arrow string column, encoded by Arrow"""
+    encoded = pc.dictionary_encode(column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column, null_encoding='encode')
+    return EncodedStrings.from_codes(encoded.indices.to_numpy(zero_copy_only=False), encoded.dictionary.to_pylist())
+
+def _fixed_width_strings(column):
+    """FixedWidthStrings from an Arrow string column, filled straight from
+    its offsets and data buffers rather than through Python strings"""
+    array = column.combine_chunks() if isinstance(column, pa.ChunkedArray) else column
+    _, offsets_buffer, data_buffer = array.buffers()
+    if len(array) == 0:
+        return FixedWidthStrings()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int32)[array.offset:array.offset + len(array) + 1]
+    data = np.frombuffer(data_buffer, dtype=np.uint8) if data_buffer is not None else np.zeros(0, dtype=np.uint8)
+    lengths = np.diff(offsets)
+    width = max(1, int(lengths.max()))
+
+    positions = np.arange(width)
+    filled = positions < lengths[:, None]
+    padded = np.zeros((len(array), width), dtype=np.uint8)
+    padded[filled] = data[(offsets[:-1, None] + positions)[filled]]
+    return FixedWidthStrings.from_array(padded.view(f'S{width}').ravel())
+
+def ledger_from_table(table):
+    """Build a Ledger from a full ledger table; dictionary indices become the
+    ledger's kind and category codes directly"""
+    table = table.unify_dictionaries().combine_chunks()
+
+    types = table.column('type').chunk(0) if table.num_rows else pa.DictionaryArray.from_arrays(pa.array([], pa.int8()), KIND_NAMES)
+    kind_codes = np.array([INCOME if name == 'income' else EXPENSE for name in types.dictionary.to_pylist()], dtype=np.int8)
+    kind = kind_codes[types.indices.to_numpy(zero_copy_only=False)] if len(kind_codes) else np.zeros(0, dtype=np.int8)
+
+    categories = table.column('category').chunk(0) if table.num_rows else pa.DictionaryArray.from_arrays(pa.array([], pa.int16()), [])
+    dates = table.column('date')
+
+    return Ledger(
+        ids=_fixed_width_strings(table.column('id')),
+        dates=_encoded_strings(pc.strftime(dates, format='%B %d, %Y')),
+        descriptions=_encoded_strings(table.column('description')),
+        amount=table.column('amount').to_numpy(),
+        day=pc.fill_null(dates.cast(pa.int32()), -1).to_numpy().astype(np.int32),
+        month=table.column('month').to_numpy().astype(np.int8),
+        year=table.column('year').to_numpy().astype(np.int16),
+        kind=kind,
+        category=categories.indices.to_numpy(zero_copy_only=False).astype(np.int16),
+        category_names=categories.dictionary.to_pylist()
+    )
+
+def load_ledger(root, years=None, months=None, output_format=None):
+    """Load a Ledger from a dataset, reading only the matching partitions"""
+    return ledger_from_table(load_table(root, years=years, months=months, output_format=output_format))
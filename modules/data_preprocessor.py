@@ -1,147 +1,114 @@
 import os
-import re
 import json
+import argparse
 from datetime import datetime
-
-def preprocess_financial_data(input_file, output_file=None):
+from modules import ledger as ledger_store
+from modules.categorizer import get_categorizer
+from modules.statement_parser import iter_records
+
+def preprocess_financial_data(input_file, output_file=None, output_format='json'):
+    """Parse a statement file and save the processed records.
+
+    output_format "json" writes a single JSON document; "parquet" and
+    "arrow" write a columnar dataset directory partitioned by year/month
+    (see modules.columnar_store). The columnar formats are written straight
+    from the ledger's arrays, so the returned data then has only the
+    summary and monthly totals, without per-record invoices and incomes.
+    """
     if output_file is None:
         base = os.path.splitext(input_file)[0]
-        output_file = f"{base}_processed.json"
+        output_file = f"{base}_processed.json" if output_format == 'json' else f"{base}_processed"
     
+    keep_records = output_format == 'json'
     invoices = []
     incomes = []
-
-    with open(input_file, 'r') as file:
-        lines = file.readlines()
-
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        invoice_match = re.match(r'Invoice #(\d+) \| (.*?) \| (.*?) \| \$(\d+)', line)
-        income_match = re.match(r'Income #(\d+) \| (.*?) \| (.*?) \| \$(\d+)', line)
-        
-        if invoice_match:
-            invoice_id, date_str, description, amount = invoice_match.groups()
-            
-            try:
-                date_obj = datetime.strptime(date_str, '%B %d, %Y')
-                
-                invoice = {
-                    'id': invoice_id,
-                    'date': date_obj.strftime('%Y-%m-%d'),
-                    'month': date_obj.strftime('%B'),
-                    'description': description,
-                    'amount': int(amount),
-                    'raw_text': line,
-                    'type': 'expense'
-                }
-
-                invoice['category'] = categorize_expense(description)
-                
-                invoices.append(invoice)
-            except Exception as e:
-                print(f"Error parsing invoice: {line}. Error: {e}")
-                
-        elif income_match:
-            income_id, date_str, description, amount = income_match.groups()
-            
-            try:
-                date_obj = datetime.strptime(date_str, '%B %d, %Y')
-
-                income = {
-                    'id': income_id,
+    iso_dates = {}
+    builder = ledger_store.LedgerBuilder()
+
+    for record in iter_records(input_file):
+        try:
+            date_obj = iso_dates.get(record.date)
+            if date_obj is None:
+                date_obj = iso_dates[record.date] = datetime.strptime(record.date, '%B %d, %Y')
+
+            if record.type == 'income':
+                category = categorize_income(record.description)
+            else:
+                category = categorize_expense(record.description)
+            builder.add(record.type, record.id, date_obj.strftime('%Y-%m-%d'), record.description, record.amount, category)
+
+            if keep_records:
+                doc = {
+                    'id': record.id,
                     'date': date_obj.strftime('%Y-%m-%d'),
                     'month': date_obj.strftime('%B'),
-                    'description': description,
-                    'amount': int(amount),
-                    'raw_text': line,
-                    'type': 'income'
+                    'description': record.description,
+                    'amount': record.amount,
+                    'type': record.type,
+                    'category': category
                 }
+                (incomes if record.type == 'income' else invoices).append(doc)
+        except Exception as e:
+            label = "income" if record.type == 'income' else "invoice"
+            print(f"Error parsing {label}: {record.line}. Error: {e}")
 
-                income['category'] = categorize_income(description)
-                
-                incomes.append(income)
-            except Exception as e:
-                print(f"Error parsing income: {line}. Error: {e}")
+    ledger = builder.build()
+    invoice_count, total_expenses = ledger.total(ledger_store.EXPENSE)
+    income_count, total_income = ledger.total(ledger_store.INCOME)
 
     financial_data = {
-        'invoices': invoices,
-        'incomes': incomes,
         'summary': {
-            'total_expenses': sum(invoice['amount'] for invoice in invoices),
-            'total_income': sum(income['amount'] for income in incomes),
-            'net_profit': sum(income['amount'] for income in incomes) - sum(invoice['amount'] for invoice in invoices),
-            'invoice_count': len(invoices),
-            'income_count': len(incomes)
+            'total_expenses': total_expenses,
+            'total_income': total_income,
+            'net_profit': total_income - total_expenses,
+            'invoice_count': invoice_count,
+            'income_count': income_count
         }
     }
+    if keep_records:
+        financial_data = {'invoices': invoices, 'incomes': incomes, **financial_data}
 
     monthly_data = {}
 
-    for invoice in invoices:
-        month = invoice['month']
-        if month not in monthly_data:
-            monthly_data[month] = {'expenses': 0, 'income': 0, 'expense_count': 0, 'income_count': 0}
-        monthly_data[month]['expenses'] += invoice['amount']
-        monthly_data[month]['expense_count'] += 1
-
-    for income in incomes:
-        month = income['month']
-        if month not in monthly_data:
-            monthly_data[month] = {'expenses': 0, 'income': 0, 'expense_count': 0, 'income_count': 0}
-        monthly_data[month]['income'] += income['amount']
-        monthly_data[month]['income_count'] += 1
-
-    for month, data in monthly_data.items():
-        data['net_profit'] = data['income'] - data['expenses']
+    for year, month in ledger.periods():
+        expense_count, expenses = ledger.total(ledger_store.EXPENSE, month, year)
+        income_count, income = ledger.total(ledger_store.INCOME, month, year)
+        monthly_data[ledger.period_label(year, month)] = {
+            'expenses': expenses,
+            'income': income,
+            'expense_count': expense_count,
+            'income_count': income_count,
+            'net_profit': income - expenses
+        }
     
     financial_data['monthly'] = monthly_data
 
-    with open(output_file, 'w') as f:
-        json.dump(financial_data, f, indent=2)
+    if output_format == 'json':
+        with open(output_file, 'w') as f:
+            json.dump(financial_data, f, indent=2)
+    else:
+        from modules.columnar_store import write_ledger
+        write_ledger(ledger, output_file, output_format)
     
-    print(f"Processed {len(invoices)} invoices and {len(incomes)} income entries. Saved to {output_file}")
+    summary = financial_data['summary']
+    print(f"Processed {summary['invoice_count']} invoices and {summary['income_count']} income entries. Saved to {output_file}")
     return financial_data
 
 def categorize_expense(description):
     """Categorize expense based on description"""
-    description = description.lower()
-    
-    categories = {
-        'utilities': ['electricity', 'internet', 'bill', 'utility'],
-        'office': ['office', 'supplies', 'equipment', 'purchase'],
-        'travel': ['travel', 'transportation'],
-        'food': ['lunch', 'dinner', 'meal', 'restaurant'],
-        'software': ['software', 'subscription', 'license'],
-    }
-    
-    for category, keywords in categories.items():
-        if any(keyword in description for keyword in keywords):
-            return category
-            
-    return 'other'
+    return get_categorizer().categorize('expense', description)
 
 def categorize_income(description):
     """Categorize income based on description"""
-    description = description.lower()
-    
-    categories = {
-        'client_work': ['client', 'project', 'consulting'],
-        'sales': ['sale', 'product', 'retail'],
-        'services': ['service', 'support', 'maintenance'],
-        'royalties': ['royalty', 'licensing'],
-        'investments': ['dividend', 'interest', 'investment'],
-    }
-    
-    for category, keywords in categories.items():
-        if any(keyword in description for keyword in keywords):
-            return category
-            
-    return 'other'
+    return get_categorizer().categorize('income', description)
 
 if __name__ == "__main__":
     script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    input_file = os.path.join(script_dir, "data/financial_statements.txt")
-    preprocess_financial_data(input_file)
\ No newline at end of file
+
+    parser = argparse.ArgumentParser(description="Preprocess a financial statement file.")
+    parser.add_argument("input_file", nargs="?", default=os.path.join(script_dir, "data/financial_statements.txt"))
+    parser.add_argument("-o", "--output", help="output file (json) or dataset directory (parquet/arrow)")
+    parser.add_argument("--format", choices=["json", "parquet", "arrow"], default="json")
+    args = parser.parse_args()
+
+    preprocess_financial_data(args.input_file, args.output, args.format)
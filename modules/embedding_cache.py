@@ -0,0 +1,212 @@
+import os
+import json
+import hashlib
+import numpy as np
+from modules.embedding_model import BUILD
+
+EMBEDDINGS_FILE = "embeddings.npy"
+KEYS_FILE = "keys.npy"
+SIDECAR_FILE = "index.json"
+STORE_VERSION = 3
+KEY_DTYPE = 'S20'
+
+def normalize_rows(matrix):
+    """L2-normalize each row so cosine similarity becomes a plain dot product"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def ledger_fingerprint(file_path):
+    """Cheap identity of a ledger file used to detect changes between runs"""
+    stat = os.stat(file_path)
+    return {
+        'path': os.path.abspath(file_path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns
+    }
+
+class EmbeddingCache:
+    """Content-addressed, memory-mapped store of chunk embeddings.
+
+    The store is a directory holding a raw float32 ``embeddings.npy`` matrix
+    (one row per chunk, in chunk order), the per-row content keys as 20-byte
+    digests in ``keys.npy``, and an ``index.json`` sidecar with the row count,
+    caller metadata and a fingerprint of the ledger it was built from. Chunk
+    text is not stored; callers keep it themselves (see
+    modules.chunk_store). The matrix is opened with
+    ``np.load(mmap_mode='r')`` so a cold start only pages in the rows that are
+    actually read, and worker processes share a single copy through the page
+    cache. Nothing is unpickled.
+
+    Rows are L2-normalized when they are encoded, so retrieval can score the
+    whole matrix with a single dot product.
+
+    Each row is keyed by a hash of the model name and the chunk text, so when
+    the ledger changes only new or changed chunks are re-encoded and rows for
+    chunks that disappeared are dropped.
+    """
+
+    def __init__(self, cache_dir, model_name):
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.embeddings_path = os.path.join(cache_dir, EMBEDDINGS_FILE)
+        self.keys_path = os.path.join(cache_dir, KEYS_FILE)
+        self.sidecar_path = os.path.join(cache_dir, SIDECAR_FILE)
+        self.sidecar = self._read_sidecar()
+
+    def _read_sidecar(self):
+        if not os.path.exists(self.sidecar_path):
+            return None
+
+        try:
+            with open(self.sidecar_path, 'r') as f:
+                sidecar = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if sidecar.get('version') != STORE_VERSION or sidecar.get('model') != self.model_name:
+            return None
+        if not isinstance(sidecar.get('rows'), int):
+            return None
+        return sidecar
+
+    def _read_keys(self, rows):
+        try:
+            keys = np.load(self.keys_path)
+        except (OSError, ValueError):
+            return None
+        if keys.dtype != np.dtype(KEY_DTYPE) or len(keys) != rows:
+            return None
+        return keys
+
+    def _open_embeddings(self, rows):
+        if rows == 0:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        try:
+            embeddings = np.load(self.embeddings_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+
+        if embeddings.ndim != 2 or len(embeddings) != rows:
+            return None
+        return embeddings
+
+    def _write_embeddings(self, embeddings):
+        tmp_path = self.embeddings_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, embeddings)
+        # Replacing rather than rewriting in place keeps existing mappings in
+        # other processes valid until they reopen the store.
+        os.replace(tmp_path, self.embeddings_path)
+
+    def _write_keys(self, keys):
+        tmp_path = self.keys_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, keys)
+        os.replace(tmp_path, self.keys_path)
+
+    def _write_sidecar(self, sidecar):
+        tmp_path = self.sidecar_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(sidecar, f, separators=(',', ':'))
+        os.replace(tmp_path, self.sidecar_path)
+
+    def chunk_key(self, chunk):
+        """Hash identifying a chunk's embedding for the current model"""
+        return hashlib.sha1(f"{self.model_name}\0{chunk}".encode('utf-8')).digest()
+
+    def clear(self):
+        self.sidecar = None
+
+    def load(self, fingerprint):
+        """Return (metadata, embeddings) if the store was built from the
+        ledger identified by fingerprint, otherwise None"""
+        if self.sidecar is None or self.sidecar.get('ledger') != fingerprint:
+            return None
+
+        embeddings = self._open_embeddings(self.sidecar['rows'])
+        if embeddings is None:
+            return None
+
+        return self.sidecar.get('metadata', {}), embeddings
+
+    def encode(self, model, chunks, metadata=None, fingerprint=None, precomputed=None):
+        """Return the embedding matrix for chunks, encoding only cache misses,
+        and persist it together with the chunk keys, metadata and fingerprint.
+
+        chunks is any sequence of str supporting len() and indexing.
+        precomputed optionally maps chunk text to an already normalized
+        vector, e.g. rows embedded in memory since the store was written.
+        """
+        keys = np.fromiter(map(self.chunk_key, chunks), dtype=KEY_DTYPE, count=len(chunks))
+
+        old_keys = np.zeros(0, dtype=KEY_DTYPE)
+        old_embeddings = None
+        if self.sidecar is not None:
+            old_embeddings = self._open_embeddings(self.sidecar['rows'])
+            stored_keys = self._read_keys(self.sidecar['rows']) if old_embeddings is not None else None
+            if stored_keys is not None:
+                old_keys = stored_keys
+
+        # Match keys against the stored ones by binary search over a sorted
+        # copy rather than a dict of millions of entries.
+        found = np.zeros(len(keys), dtype=bool)
+        old_rows = np.zeros(len(keys), dtype=np.intp)
+        if len(old_keys) and len(keys):
+            order = np.argsort(old_keys, kind='stable')
+            sorted_keys = old_keys[order]
+            positions = np.minimum(np.searchsorted(sorted_keys, keys), len(old_keys) - 1)
+            found = sorted_keys[positions] == keys
+            old_rows = order[positions]
+
+        # Each distinct missing key is encoded once, in order of first appearance.
+        missing_rows = np.flatnonzero(~found)
+        new_vectors = None
+        if len(missing_rows):
+            _, first, inverse = np.unique(keys[missing_rows], return_index=True, return_inverse=True)
+            appearance = np.argsort(first)
+            rank = np.empty_like(appearance)
+            rank[appearance] = np.arange(len(appearance))
+            new_index = rank[inverse.ravel()]
+            missing = [chunks[row] for row in missing_rows[first[appearance]].tolist()]
+
+            precomputed = precomputed or {}
+            to_encode = [chunk for chunk in missing if chunk not in precomputed]
+            encoded = dict(zip(to_encode, normalize_rows(model.encode(to_encode, purpose=BUILD)))) if to_encode else {}
+            new_vectors = np.array([
+                precomputed[chunk] if chunk in precomputed else encoded[chunk]
+                for chunk in missing
+            ], dtype=np.float32)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        if not np.array_equal(keys, old_keys):
+            if new_vectors is not None:
+                dim = new_vectors.shape[1]
+            elif old_embeddings is not None and old_embeddings.size:
+                dim = old_embeddings.shape[1]
+            else:
+                dim = 0
+
+            embeddings = np.empty((len(keys), dim), dtype=np.float32)
+            reused_dest = np.flatnonzero(found)
+            if len(reused_dest):
+                embeddings[reused_dest] = old_embeddings[old_rows[reused_dest]]
+            if len(missing_rows):
+                embeddings[missing_rows] = new_vectors[new_index]
+
+            self._write_embeddings(embeddings)
+            self._write_keys(keys)
+
+        self.sidecar = {
+            'version': STORE_VERSION,
+            'model': self.model_name,
+            'ledger': fingerprint,
+            'rows': len(keys),
+            'metadata': metadata or {}
+        }
+        self._write_sidecar(self.sidecar)
+
+        return self._open_embeddings(len(keys))
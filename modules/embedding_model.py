@@ -0,0 +1,118 @@
+import os
+import threading
+from typing import NamedTuple
+
+PRECISIONS = ('fp32', 'int8')
+QUERY = 'query'
+BUILD = 'build'
+
+class EncodeSettings(NamedTuple):
+    """Batch size and intra-op thread count for one kind of encode call;
+    threads=0 leaves torch's setting alone"""
+    batch_size: int
+    threads: int
+
+# Queries arrive one or a few at a time, where the fork/join overhead of a
+# large thread pool outweighs the tiny matrix products, so they use few
+# threads. Index builds are throughput-bound: big batches on every core.
+DEFAULT_SETTINGS = {
+    QUERY: EncodeSettings(batch_size=32, threads=min(2, os.cpu_count() or 1)),
+    BUILD: EncodeSettings(batch_size=128, threads=os.cpu_count() or 1),
+}
+
+# torch's thread count is process-wide, so setting it and encoding happen
+# under one lock shared by every model in the process
+_threads_lock = threading.Lock()
+
+def load_precision(precision=None):
+    """Validated precision, by default from FINANCE_AGENT_EMBEDDING_PRECISION"""
+    precision = precision or os.environ.get("FINANCE_AGENT_EMBEDDING_PRECISION", "") or 'fp32'
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported embedding precision: {precision}")
+    return precision
+
+def load_encode_settings(purpose, settings=None):
+    """EncodeSettings for QUERY or BUILD: settings if given, otherwise the
+    defaults overridden by FINANCE_AGENT_<PURPOSE>_BATCH and
+    FINANCE_AGENT_<PURPOSE>_THREADS"""
+    if settings is not None:
+        return settings
+    default = DEFAULT_SETTINGS[purpose]
+    batch = os.environ.get(f"FINANCE_AGENT_{purpose.upper()}_BATCH", "")
+    threads = os.environ.get(f"FINANCE_AGENT_{purpose.upper()}_THREADS", "")
+    return EncodeSettings(int(batch) if batch else default.batch_size, int(threads) if threads else default.threads)
+
+class LazyEmbeddingModel:
+    """SentenceTransformer stand-in that defers importing torch and
+    sentence_transformers, and loading the weights, until the first encode.
+
+    Engines whose index is already built and that only see aggregate queries
+    never load the model at all. load() can be called ahead of time, e.g. on
+    a background thread, to warm it up.
+
+    precision "int8" applies PyTorch dynamic quantization to the model's
+    Linear layers on CPU: weights are stored as int8 and activations are
+    quantized per batch, which cuts CPU time per encode. The int8 path has
+    been run on torch 2.14 with a randomly initialized model of the same
+    architecture, but its accuracy on the real paraphrase-MiniLM-L3-v2
+    weights is unverified: run benchmarks.embedding_accuracy before relying
+    on it. Vectors from different precisions are cached under different
+    names (cache_name).
+
+    encode() takes purpose=QUERY (the default) or BUILD and applies that
+    purpose's batch size and thread count. torch's intra-op thread count is
+    process-wide, so encodes with a thread count are serialized: a query
+    arriving during a --watch rebuild waits for the build's encode instead
+    of running it on the query's thread setting, or vice versa.
+    """
+
+    def __init__(self, model_name, precision=None, query_settings=None, build_settings=None):
+        self.model_name = model_name
+        self.precision = load_precision(precision)
+        self.settings = {
+            QUERY: load_encode_settings(QUERY, query_settings),
+            BUILD: load_encode_settings(BUILD, build_settings),
+        }
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def cache_name(self):
+        """Name to key cached embeddings by, distinct per precision"""
+        return self.model_name if self.precision == 'fp32' else f"{self.model_name}+{self.precision}"
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    def load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self._create_model()
+        return self._model
+
+    def _create_model(self):
+        from sentence_transformers import SentenceTransformer
+        if self.precision == 'fp32':
+            return SentenceTransformer(self.model_name)
+
+        import torch
+        model = SentenceTransformer(self.model_name, device='cpu')
+        model.eval()
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+    def _set_threads(self, threads):
+        import torch
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+
+    def encode(self, sentences, purpose=QUERY, **kwargs):
+        model = self.load()
+        settings = self.settings[purpose]
+        kwargs.setdefault('batch_size', settings.batch_size)
+        if not settings.threads:
+            return model.encode(sentences, **kwargs)
+        with _threads_lock:
+            self._set_threads(settings.threads)
+            return model.encode(sentences, **kwargs)
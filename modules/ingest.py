@@ -0,0 +1,72 @@
+import os
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+from modules.statement_parser import iter_lines, parse_line
+from modules.categorizer import get_categorizer
+
+STATEMENT_PATTERNS = ('*.txt', '*.txt.gz')
+
+class ParsedStatement(NamedTuple):
+    """Lines, records and record categories of one statement file"""
+    path: str
+    lines: list
+    records: list
+    categories: list
+
+def resolve_statement_files(source):
+    """Expand a statement file, a directory of statements or a glob pattern
+    into a sorted list of file paths"""
+    if os.path.isdir(source):
+        paths = []
+        for pattern in STATEMENT_PATTERNS:
+            paths.extend(glob.glob(os.path.join(source, pattern)))
+    elif glob.has_magic(source):
+        paths = glob.glob(source)
+    else:
+        paths = [source]
+
+    paths = sorted(set(paths))
+    if not paths:
+        raise FileNotFoundError(f"No statement files found for {source}")
+    return paths
+
+def parse_statement(path, end=None):
+    """Parse and categorize one statement file, optionally only its first end bytes"""
+    lines = []
+    records = []
+
+    for line in iter_lines(path, end):
+        lines.append(line)
+
+        record = parse_line(line)
+        if record is not None:
+            records.append(record)
+
+    categorizer = get_categorizer()
+    categories = [None] * len(records)
+    for kind in ('expense', 'income'):
+        positions = [position for position, record in enumerate(records) if record.type == kind]
+        kind_categories = categorizer.categorize_many(kind, [records[position].description for position in positions])
+        for position, category in zip(positions, kind_categories):
+            categories[position] = category
+
+    return ParsedStatement(path, lines, records, categories)
+
+def ingest_statements(paths, max_workers=None, ends=None):
+    """Parse statement files in parallel with a process pool.
+
+    Results are yielded in the order of paths regardless of which worker
+    finishes first, so merging them is deterministic. A single file is parsed
+    in-process to avoid the pool start-up cost. ends optionally gives a byte
+    limit per path.
+    """
+    if ends is None:
+        ends = [None] * len(paths)
+
+    if len(paths) == 1:
+        yield parse_statement(paths[0], ends[0])
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(parse_statement, paths, ends)
@@ -1,77 +1,236 @@
 import re
+from typing import NamedTuple, Optional
+from modules.ledger import MONTHS
+from modules.tracing import get_tracer
 
-def parse_intent(text):
+# Keyword features. Matching is by substring, so "expenses" counts as
+# "expense" and "earnings" as "earn".
+BALANCE_WORDS = ("balance", "how much do i have", "net worth", "profit and loss", "bottom line")
+EXPENSE_WORDS = ("expense", "spend", "spent", "cost", "payment", "bill", "invoice")
+INCOME_WORDS = ("income", "earn", "revenue", "payment received", "earnings", "money in")
+NET_WORDS = ("profit", "loss", "net", "bottom line")
+EXPENSE_SUPERLATIVES = ("highest", "largest", "biggest", "most expensive")
+INCOME_SUPERLATIVES = ("highest", "largest", "biggest", "most")
+RECENCY_WORDS = ("latest", "recent", "newest", "last")
+SUMMARY_WORDS = ("how much", "total", "what did", "give me", "show me", "summary")
+EXIT_WORDS = ("stop", "exit", "quit", "goodbye")
+RECORD_WORDS = ("voice", "income")
+QUARTER_WORDS = {"first quarter": 1, "second quarter": 2, "third quarter": 3, "fourth quarter": 4}
+WINDOW_UNIT_DAYS = {"day": 1, "week": 7, "month": 30, "year": 365}
+
+(BALANCE, EXPENSE, INCOME, NET, EXPENSE_SUPERLATIVE, INCOME_SUPERLATIVE,
+ RECENT, SUMMARY, EXIT, RECORD) = (1 << bit for bit in range(10))
+
+FEATURE_WORDS = {
+    BALANCE: BALANCE_WORDS,
+    EXPENSE: EXPENSE_WORDS,
+    INCOME: INCOME_WORDS,
+    NET: NET_WORDS,
+    EXPENSE_SUPERLATIVE: EXPENSE_SUPERLATIVES,
+    INCOME_SUPERLATIVE: INCOME_SUPERLATIVES,
+    RECENT: RECENCY_WORDS,
+    SUMMARY: SUMMARY_WORDS,
+    EXIT: EXIT_WORDS,
+    RECORD: RECORD_WORDS,
+}
+
+def _trie_pattern(words):
+    """Regex alternation of words factored into a prefix trie.
+
+    re tries alternatives one by one, so a flat alternation costs one
+    attempt per keyword at every position; the trie fails after a single
+    character for most positions. Longer words are preferred, as in a
+    longest-first alternation.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        ends = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if ends:
+            return '(?:' + body + ')?' if len(branches) == 1 else body + '?'
+        return body
+
+    return build(trie)
+
+def _compile_vocabulary():
+    """Map every keyword, month name and quarter phrase to (feature bits,
+    first month, quarter).
+
+    A keyword also carries the features of every shorter keyword it
+    contains, so the single leftmost-longest scan below sees the same
+    features as separate substring checks would.
+    """
+    vocabulary = {word for words in FEATURE_WORDS.values() for word in words}
+    vocabulary.update(MONTHS)
+    vocabulary.update(QUARTER_WORDS)
+
+    features = {}
+    for word in vocabulary:
+        mask = 0
+        for feature, words in FEATURE_WORDS.items():
+            if any(keyword in word for keyword in words):
+                mask |= feature
+        months = [index for index, month in enumerate(MONTHS, start=1) if month in word]
+        features[word] = (mask, months[0] if months else 0, QUARTER_WORDS.get(word, 0))
+
+    # Groups: keyword, record number after "#"/"number", four-digit year,
+    # "q1".."q4" (the literal "q" comes first so other positions fail fast).
+    pattern = re.compile(
+        rf'({_trie_pattern(vocabulary)})'
+        r'|(?:#|number)\s*(\d{1,3})'
+        r'|(?<!\d)((?:19|20)\d{2})(?!\d)'
+        r'|q(?<![a-z0-9]q)([1-4])(?!\d)'
+    )
+    return pattern, features
+
+INTENT_PATTERN, WORD_FEATURES = _compile_vocabulary()
+
+# "last 90 days", "past 3 months"; only searched for when "last" or "past"
+# occurs, so ordinary utterances pay nothing for it.
+WINDOW_PATTERN = re.compile(r'(?:last|past)\s+(\d+)\s+(day|week|month|year)s?')
+
+# "spent on cloud storage", "spend for ads": spending on a particular item,
+# which retrieval answers better than the overall total
+ITEM_SPEND_PATTERN = re.compile(r'\bspen[dt]\s+(?:on|for)\s')
+
+# Checked in this order, as the keyword cascade did
+ENTITIES = (
+    ("expense", EXPENSE, EXPENSE_SUPERLATIVE, "expenses"),
+    ("income", INCOME, INCOME_SUPERLATIVE, "income"),
+)
+
+class Intent(NamedTuple):
+    """Classified utterance.
+
+    name is "query_financial_docs" or "exit", and query is the canonical
+    question passed to the RAG engine. entity is "expense", "income" or
+    None. measure is one of "highest", "latest", "total", "month", "period",
+    "record", "net" or "summary", or None for free-form questions. year,
+    quarter and days (for "the last N days") narrow the period.
+    """
+    name: str
+    query: Optional[str] = None
+    entity: Optional[str] = None
+    measure: Optional[str] = None
+    month: Optional[int] = None
+    year: Optional[int] = None
+    quarter: Optional[int] = None
+    days: Optional[int] = None
+    record_id: Optional[str] = None
+
+    def to_dict(self):
+        """The {"intent", "query"} form returned by parse_intent"""
+        if self.name == "exit":
+            return {"intent": "exit"}
+        return {"intent": self.name, "query": self.query}
+
+def _query(query, entity=None, measure=None, month=None, year=None, quarter=None, days=None, record_id=None):
+    return Intent("query_financial_docs", query, entity, measure, month, year, quarter, days, record_id)
+
+def classify(text):
+    """Classify an utterance into an Intent with one scan of a compiled
+    pattern. The point is extracting every field in a single pass; it runs
+    at about the old keyword cascade's speed (see
+    benchmarks.intent_parser_benchmark)."""
     text = text.lower().strip()
-    
-    if any(phrase in text for phrase in ["balance", "how much do i have", "net worth", "profit and loss", "bottom line"]):
-        return {"intent": "query_financial_docs", "query": "what is my financial balance"}
-
-    elif any(word in text for word in ["expense", "spent", "cost", "payment", "bill", "invoice"]):
-        if any(word in text for word in ["highest", "largest", "biggest", "most expensive"]):
-            return {"intent": "query_financial_docs", "query": "what is the highest expense"}
-
-        elif any(word in text for word in ["latest", "recent", "newest", "last"]):
-            return {"intent": "query_financial_docs", "query": "what is the most recent expense"}
-
-        months = ["january", "february", "march", "april", "may", "june", 
-                 "july", "august", "september", "october", "november", "december"]
-                 
-        for month in months:
-            if month in text:
-                return {"intent": "query_financial_docs", "query": f"expenses in {month}"}
-
-        return {"intent": "query_financial_docs", "query": "total expenses"}
-
-    elif any(word in text for word in ["income", "earn", "revenue", "payment received", "earnings", "money in"]):
-        if any(word in text for word in ["highest", "largest", "biggest", "most"]):
-            return {"intent": "query_financial_docs", "query": "what is the highest income"}
-            
-        elif any(word in text for word in ["latest", "recent", "newest", "last"]):
-            return {"intent": "query_financial_docs", "query": "what is the most recent income"}
-            
-        months = ["january", "february", "march", "april", "may", "june", 
-                 "july", "august", "september", "october", "november", "december"]
-                 
-        for month in months:
-            if month in text:
-                return {"intent": "query_financial_docs", "query": f"income in {month}"}
-                
-        return {"intent": "query_financial_docs", "query": "total income"}
-    
-    elif any(word in text for word in ["profit", "loss", "net", "bottom line"]):
-        months = ["january", "february", "march", "april", "may", "june", 
-                 "july", "august", "september", "october", "november", "december"]
-                 
-        for month in months:
-            if month in text:
-                return {"intent": "query_financial_docs", "query": f"net profit for {month}"}
-                
-        return {"intent": "query_financial_docs", "query": "what is the net profit"}
-    
-    elif re.search(r'invoice.*(#|number)\s*(\d{3}|\d{1,3})', text) or re.search(r'voice.*(#|number)\s*(\d{3}|\d{1,3})', text):
-        invoice_match = re.search(r'(\d{3}|\d{1,3})', text)
-        if invoice_match:
-            invoice_number = invoice_match.group(1).zfill(3)  
-            return {"intent": "query_financial_docs", "query": f"invoice #{invoice_number}"}
-    
-    elif re.search(r'income.*(#|number)\s*(\d{3}|\d{1,3})', text):
-        income_match = re.search(r'(\d{3}|\d{1,3})', text)
-        if income_match:
-            income_number = income_match.group(1).zfill(3)
-            return {"intent": "query_financial_docs", "query": f"income #{income_number}"}
-    
-    elif any(month in text for month in ["january", "february", "march", "april", "may", "june", 
-                                        "july", "august", "september", "october", "november", "december"]):
-        for month in ["january", "february", "march", "april", "may", "june", 
-                    "july", "august", "september", "october", "november", "december"]:
-            if month in text:
-                return {"intent": "query_financial_docs", "query": f"financial summary for {month}"}
-
-    elif any(word in text for word in ["how much", "total", "what did", "give me", "show me", "summary"]):
-        return {"intent": "query_financial_docs", "query": text}
-    
-    elif any(word in text for word in ["stop", "exit", "quit", "goodbye"]):
-        return {"intent": "exit"}
-
-    else:
-        return {"intent": "query_financial_docs", "query": text}
\ No newline at end of file
+
+    features = 0
+    month = 0
+    year = None
+    quarter = None
+    days = None
+    record_id = None
+    for word, ref_id, year_digits, quarter_digit in INTENT_PATTERN.findall(text):
+        if word:
+            word_features, word_month, word_quarter = WORD_FEATURES[word]
+            features |= word_features
+            if word_month and (not month or word_month < month):
+                month = word_month
+            if word_quarter and quarter is None:
+                quarter = word_quarter
+        elif ref_id:
+            if record_id is None:
+                record_id = ref_id.zfill(3)
+        elif year_digits:
+            if year is None:
+                year = int(year_digits)
+        elif quarter is None:
+            quarter = int(quarter_digit)
+
+    if "last" in text or "past" in text:
+        window = WINDOW_PATTERN.search(text)
+        if window:
+            days = int(window.group(1)) * WINDOW_UNIT_DAYS[window.group(2)]
+
+    month_name = MONTHS[month - 1] if month else None
+    month = month or None
+    in_year = f" {year}" if year is not None else ""
+
+    if record_id is not None and features & RECORD:
+        if features & INCOME and not features & EXPENSE:
+            return _query(f"income #{record_id}", entity="income", measure="record", record_id=record_id)
+        return _query(f"invoice #{record_id}", entity="expense", measure="record", record_id=record_id)
+
+    if features & BALANCE:
+        return _query("what is my financial balance", measure="net", year=year, quarter=quarter, days=days)
+
+    for entity, entity_feature, superlative, plural in ENTITIES:
+        if not features & entity_feature:
+            continue
+        if features & superlative:
+            return _query(f"what is the highest {entity}", entity=entity, measure="highest", year=year, quarter=quarter, days=days)
+        if days is not None:
+            return _query(f"{plural} in the last {days} days", entity=entity, measure="period", year=year, quarter=quarter, days=days)
+        if features & RECENT:
+            return _query(f"what is the most recent {entity}", entity=entity, measure="latest", year=year, quarter=quarter, days=days)
+        if quarter is not None:
+            return _query(f"{plural} in q{quarter}{in_year}", entity=entity, measure="period", year=year, quarter=quarter, days=days)
+        if month_name is not None:
+            return _query(f"{plural} in {month_name}{in_year}", entity=entity, measure="month", month=month, year=year, quarter=quarter, days=days)
+        if year is not None:
+            return _query(f"total {plural} in {year}", entity=entity, measure="period", year=year, quarter=quarter, days=days)
+        if ITEM_SPEND_PATTERN.search(text):
+            return _query(text, entity=entity, year=year, quarter=quarter, days=days)
+        return _query(f"total {plural}", entity=entity, measure="total", year=year, quarter=quarter, days=days)
+
+    # A window on its own asks for the net over it; with only summary words
+    # ("show me the last 30 days") retrieval answers instead.
+    window_net = days is not None and (features & NET or not features & SUMMARY)
+    if features & NET or window_net or quarter is not None:
+        if window_net:
+            return _query(f"net profit for the last {days} days", measure="net", year=year, quarter=quarter, days=days)
+        if quarter is not None:
+            return _query(f"net profit for q{quarter}{in_year}", measure="net", year=year, quarter=quarter, days=days)
+        if month_name is not None:
+            return _query(f"net profit for {month_name}{in_year}", measure="net", month=month, year=year, quarter=quarter, days=days)
+        if year is not None:
+            return _query(f"net profit for {year}", measure="net", year=year, quarter=quarter, days=days)
+        return _query("what is the net profit", measure="net", year=year, quarter=quarter, days=days)
+
+    if month_name is not None:
+        return _query(f"financial summary for {month_name}{in_year}", measure="summary", month=month, year=year, quarter=quarter, days=days)
+
+    if features & SUMMARY:
+        # Only an explicit "total" asks for the overall figures; "how much
+        # did I pay for ..." and "show me ..." are answered from retrieval,
+        # as is a total over a window, which the overall figures don't cover.
+        measure = "total" if "total" in text and days is None else None
+        return _query(text, measure=measure, year=year, quarter=quarter, days=days)
+
+    if features & EXIT:
+        return Intent("exit")
+
+    return _query(text, year=year, quarter=quarter, days=days)
+
+def parse_intent(text):
+    with get_tracer().stage("parse_intent"):
+        return classify(text).to_dict()
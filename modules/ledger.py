@@ -0,0 +1,579 @@
+import os
+import re
+import json
+from array import array
+from datetime import datetime, date
+import numpy as np
+from modules.categorizer import get_categorizer
+from modules.rollup import Rollup
+from modules.string_columns import EncodedStrings, FixedWidthStrings, save_array, save_json
+
+EXPENSE = 0
+INCOME = 1
+
+MONTHS = ["january", "february", "march", "april", "may", "june",
+          "july", "august", "september", "october", "november", "december"]
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+LEDGER_COLUMNS = ('amount', 'day', 'month', 'year', 'kind', 'category')
+
+_MONTH_PATTERN = "|".join(MONTHS)
+
+DATE_FORMATS = ('%B %d, %Y', '%Y-%m-%d')
+
+# IDs appended since the sorted ID index was built are scanned linearly
+# until there are this many (or a quarter of the indexed rows).
+ID_TAIL_ROWS = 65536
+
+def _parse_date(date_str):
+    """(epoch day, month, year) for a ledger or ISO date, or (-1, 0, 0)"""
+    for date_format in DATE_FORMATS:
+        try:
+            parsed = datetime.strptime(date_str, date_format).date()
+        except ValueError:
+            continue
+        return parsed.toordinal() - EPOCH_ORDINAL, parsed.month, parsed.year
+    return -1, 0, 0
+
+def day_number(year, month, day=1):
+    """Days since 1970-01-01 of a calendar date"""
+    return date(year, month, day).toordinal() - EPOCH_ORDINAL
+
+def period_days(year, month=None, quarter=None):
+    """Inclusive (first day, last day) numbers of a month, a quarter or a
+    whole year"""
+    if month is not None:
+        first_month, months = month, 1
+    elif quarter is not None:
+        first_month, months = 3 * quarter - 2, 3
+    else:
+        first_month, months = 1, 12
+    end_year, end_month = divmod(first_month - 1 + months, 12)
+    return day_number(year, first_month), day_number(year + end_year, end_month + 1) - 1
+
+def _kind_of(word):
+    return INCOME if word == 'income' else EXPENSE
+
+def _month_of(month_name):
+    return MONTHS.index(month_name) + 1
+
+def _year_of(year):
+    return int(year) if year is not None else None
+
+def _group_rows(keys, rows=None):
+    """Map each distinct key to the ascending rows holding it"""
+    if rows is None:
+        rows = np.arange(len(keys))
+    if len(rows) == 0:
+        return {}
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = np.r_[0, boundaries]
+    return dict(zip(sorted_keys[starts].tolist(), np.split(rows[order], boundaries)))
+
+def _append_rows(index, key, rows):
+    existing = index.get(key)
+    index[key] = rows if existing is None else np.concatenate([existing, rows])
+
+class Ledger:
+    """Columnar store of parsed ledger records.
+
+    Amounts, day numbers (days since 1970-01-01), months, years, record types
+    and category codes are held in NumPy arrays so aggregate questions reduce
+    to vectorized sums and arg-maxes. IDs, descriptions and the original date
+    strings, used for rendering answers, are kept as compact string columns
+    (see modules.string_columns): IDs in a bytes array, dates and
+    descriptions dictionary-encoded. Indexing them returns str.
+
+    Lookup indexes are built once at construction: (type, year, month) ->
+    rows and category -> rows; IDs are found through a sorted copy of the
+    (type, ID) columns, built on first use. Daily counts and
+    amounts per type and per (type, category) are rolled up into prefix
+    sums, so totals for any month, quarter, year or day range are O(1)
+    instead of a scan of the ledger.
+
+    extend() appends records in place: columns grow geometrically and the
+    indexes and aggregates are updated from the new rows only.
+    """
+
+    def __init__(self, ids, dates, descriptions, amount, day, month, year, kind, category, category_names):
+        self.ids = ids if isinstance(ids, FixedWidthStrings) else FixedWidthStrings(ids)
+        self.dates = dates if isinstance(dates, EncodedStrings) else EncodedStrings(dates)
+        self.descriptions = descriptions if isinstance(descriptions, EncodedStrings) else EncodedStrings(descriptions)
+        self.category_names = category_names
+        self._category_codes = {name: code for code, name in enumerate(category_names)}
+
+        self._buffers = {}
+        self._size = 0
+        self._set_columns(0, {
+            'amount': amount,
+            'day': day,
+            'month': month,
+            'year': year,
+            'kind': kind,
+            'category': category
+        })
+
+        self._id_index = None
+        self.period_rows = {}
+        self.rollup = Rollup()
+        self.category_rows = {}
+        self.kind_totals = {EXPENSE: 0, INCOME: 0}
+        self.highest_rows = {}
+        self.latest_rows = {}
+        self._kind_rows = {EXPENSE: np.zeros(0, dtype=np.intp), INCOME: np.zeros(0, dtype=np.intp)}
+        self._index_rows(np.arange(len(amount)))
+
+    def _set_columns(self, start, values):
+        """Write column values at row start, growing the buffers as needed"""
+        size = start + len(values['amount'])
+        for name in LEDGER_COLUMNS:
+            buffer = self._buffers.get(name)
+            column = np.asarray(values[name])
+            if buffer is None:
+                buffer = column
+            elif len(buffer) < size:
+                grown = np.empty(max(size, 2 * len(buffer)), dtype=buffer.dtype)
+                grown[:start] = buffer[:start]
+                buffer = grown
+            if buffer is not column:
+                buffer[start:size] = column
+            self._buffers[name] = buffer
+            setattr(self, name, buffer[:size])
+        self._size = size
+
+    def _index_rows(self, new_rows):
+        """Fold new_rows into the lookup indexes and aggregates"""
+        if len(new_rows) == 0:
+            return
+
+        dated = new_rows[self.month[new_rows] > 0]
+        kind = self.kind[dated].astype(np.int64)
+        month = self.month[dated].astype(np.int64)
+        year = self.year[dated].astype(np.int64)
+
+        for key, rows in _group_rows((year * 12 + month - 1) * 2 + kind, dated).items():
+            period, record_kind = divmod(key, 2)
+            period_year, period_month = divmod(period, 12)
+            _append_rows(self.period_rows, (record_kind, period_year, period_month + 1), rows)
+
+        # Series 0/1 are the type totals, 2 + 2 * category + type the
+        # per-category totals of each type.
+        category_series = 2 + 2 * self.category[dated].astype(np.int64) + kind
+        self.rollup.add(
+            np.concatenate([kind, category_series]),
+            np.tile(self.day[dated], 2),
+            np.tile(self.amount[dated], 2)
+        )
+
+        for code, rows in _group_rows(self.category[new_rows].astype(np.int64), new_rows).items():
+            _append_rows(self.category_rows, self.category_names[code], rows)
+
+        for record_kind in (EXPENSE, INCOME):
+            rows = new_rows[self.kind[new_rows] == record_kind]
+            if len(rows) == 0:
+                continue
+
+            self._kind_rows[record_kind] = np.concatenate([self._kind_rows[record_kind], rows])
+            self.kind_totals[record_kind] += int(self.amount[rows].sum())
+
+            # Earlier rows win ties, matching max() over the records in order.
+            highest = int(rows[np.argmax(self.amount[rows])])
+            current = self.highest_rows.get(record_kind)
+            if current is None or self.amount[highest] > self.amount[current]:
+                self.highest_rows[record_kind] = highest
+
+            latest = int(rows[np.argmax(self.day[rows])])
+            current = self.latest_rows.get(record_kind)
+            if current is None or self.day[latest] > self.day[current]:
+                self.latest_rows[record_kind] = latest
+
+    def extend(self, other):
+        """Append the records of another ledger, updating indexes and
+        aggregates incrementally"""
+        if len(other) == 0:
+            return
+
+        codes = np.array([self._category_code(name) for name in other.category_names], dtype=np.int16)
+        start = self._size
+        self._set_columns(start, {
+            'amount': other.amount,
+            'day': other.day,
+            'month': other.month,
+            'year': other.year,
+            'kind': other.kind,
+            'category': codes[other.category]
+        })
+        self.ids.extend(other.ids)
+        self.dates.extend(other.dates)
+        self.descriptions.extend(other.descriptions)
+
+        self._index_rows(np.arange(start, self._size))
+
+    def _category_code(self, name):
+        if name not in self._category_codes:
+            self._category_codes[name] = len(self.category_names)
+            self.category_names.append(name)
+        return self._category_codes[name]
+
+    @classmethod
+    def from_records(cls, invoices, incomes):
+        """Build a ledger from invoice and income dicts, as produced by the RAG
+        engine or the preprocessor"""
+        builder = LedgerBuilder()
+        for doc in list(invoices) + list(incomes):
+            builder.add(doc['type'], doc['id'], doc['date'], doc['description'], doc['amount'], doc.get('category'))
+        return builder.build()
+
+    def __len__(self):
+        return self._size
+
+    def save(self, directory, prefix="ledger", tag=None):
+        """Write the columns as .npy files under directory. tag (e.g. the
+        statement fingerprint) is stored alongside and checked by load()."""
+        base = os.path.join(directory, prefix)
+        for name in LEDGER_COLUMNS:
+            save_array(f"{base}_{name}.npy", getattr(self, name))
+        self.ids.save(f"{base}_ids")
+        self.dates.save(f"{base}_dates")
+        self.descriptions.save(f"{base}_descriptions")
+        # Written last: a ledger is only loaded once its manifest matches.
+        save_json(f"{base}.json", {'rows': len(self), 'category_names': self.category_names, 'tag': tag})
+
+    @classmethod
+    def load(cls, directory, prefix="ledger", tag=None):
+        """Ledger written by save() with the same tag, or None"""
+        base = os.path.join(directory, prefix)
+        try:
+            with open(f"{base}.json", 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('tag') != tag:
+                return None
+            columns = {name: np.load(f"{base}_{name}.npy") for name in LEDGER_COLUMNS}
+            ledger = cls(
+                ids=FixedWidthStrings.load(f"{base}_ids"),
+                dates=EncodedStrings.load(f"{base}_dates"),
+                descriptions=EncodedStrings.load(f"{base}_descriptions"),
+                category_names=manifest['category_names'],
+                **columns
+            )
+        except (OSError, ValueError, KeyError):
+            return None
+        if not len(ledger) == len(ledger.ids) == len(ledger.dates) == len(ledger.descriptions) == manifest['rows']:
+            return None
+        return ledger
+
+    def rows(self, kind, month=None, year=None):
+        """Row indices of one record type, optionally limited to a month
+        (1-12) of a year, by default the latest year with that month"""
+        if month is None:
+            return self._kind_rows[kind]
+        if year is None:
+            year = self.resolve_year(month)
+        return self.period_rows.get((kind, year, month), self._kind_rows[kind][:0])
+
+    def periods(self, kind=None):
+        """(year, month) pairs that have records, in calendar order"""
+        return sorted({(year, month) for record_kind, year, month in self.period_rows if kind is None or record_kind == kind})
+
+    def years(self):
+        """Years that have records, in order"""
+        return sorted({year for _, year, _ in self.period_rows})
+
+    def resolve_year(self, month=None):
+        """Latest year with records in month (or at all), or None"""
+        years = [year for _, year, record_month in self.period_rows if month is None or record_month == month]
+        return max(years) if years else None
+
+    def period_label(self, year, month=None, quarter=None):
+        """"March" (or "March 2025" once the ledger spans several years),
+        "Q2 2024" or "2024" """
+        if month is not None:
+            label = MONTHS[month - 1].capitalize()
+            return f"{label} {year}" if len(self.years()) > 1 else label
+        if quarter is not None:
+            return f"Q{quarter} {year}"
+        return str(year)
+
+    def range_total(self, kind, first_day, last_day, category=None):
+        """(count, total amount) for a record type over an inclusive range of
+        day numbers, optionally for one category"""
+        if category is None:
+            return self.rollup.total(kind, first_day, last_day)
+        if category not in self._category_codes:
+            return 0, 0
+        return self.rollup.total(2 + 2 * self._category_codes[category] + kind, first_day, last_day)
+
+    def total(self, kind, month=None, year=None, quarter=None, category=None):
+        """(count, total amount) for a record type, overall or for a month,
+        quarter or year. A month or quarter without a year means the latest
+        year that has records for it."""
+        if month is None and year is None and quarter is None:
+            if category is not None:
+                rows = self.category_rows.get(category)
+                rows = rows[self.kind[rows] == kind] if rows is not None else ()
+                return len(rows), int(self.amount[rows].sum()) if len(rows) else 0
+            return len(self._kind_rows[kind]), self.kind_totals[kind]
+        if year is None:
+            year = self.resolve_year(month)
+            if year is None:
+                return 0, 0
+        return self.range_total(kind, *period_days(year, month, quarter), category=category)
+
+    def highest(self, kind):
+        """Row with the largest amount, or None"""
+        return self.highest_rows.get(kind)
+
+    def latest(self, kind):
+        """Row with the most recent date, or None"""
+        return self.latest_rows.get(kind)
+
+    def _index_ids(self):
+        """(row order, sorted IDs, start of each type, rows covered): rows
+        sorted by (type, ID), where the stable sort keeps the first of
+        duplicate IDs first"""
+        ids = self.ids.array
+        kind = self.kind[:len(ids)]
+        order = np.lexsort((ids, kind))
+        kind_starts = np.searchsorted(kind[order], [EXPENSE, INCOME, INCOME + 1])
+        # Swapped in as one tuple so concurrent readers never mix two builds.
+        self._id_index = (order, ids[order], kind_starts, len(ids))
+        return self._id_index
+
+    def find(self, kind, record_id):
+        """Row of the first record with the given type and ID, or None"""
+        id_index = self._id_index
+        if id_index is None or self._size - id_index[3] > max(ID_TAIL_ROWS, id_index[3] // 4):
+            id_index = self._index_ids()
+        order, sorted_ids, kind_starts, indexed = id_index
+        target = np.bytes_(record_id.encode('utf-8'))
+
+        first, last = kind_starts[kind], kind_starts[kind + 1]
+        position = first + int(np.searchsorted(sorted_ids[first:last], target))
+        if position < last and sorted_ids[position] == target:
+            return int(order[position])
+
+        # Rows appended since the index was built
+        size = min(len(self.ids), self._size)
+        tail = np.flatnonzero((self.ids.array[indexed:size] == target) & (self.kind[indexed:size] == kind))
+        return indexed + int(tail[0]) if len(tail) else None
+
+    def answer(self, query):
+        """Answer a canonical aggregate query directly from the columns.
+
+        Returns None when the query is not an aggregate or the ledger has no
+        matching records, so the caller can fall back to retrieval.
+        """
+        query = query.lower().strip()
+        for pattern, handler in AGGREGATE_QUERIES:
+            match = pattern.match(query)
+            if match:
+                return handler(self, *match.groups())
+        return None
+
+    def highest_answer(self, kind):
+        row = self.highest(kind)
+        if row is None:
+            return None
+        if kind == INCOME:
+            return f"The highest income is #{self.ids[row]} from {self.descriptions[row]} at ${int(self.amount[row])}."
+        return f"The highest invoice is #{self.ids[row]} for {self.descriptions[row]} at ${int(self.amount[row])}."
+
+    def latest_answer(self, kind):
+        row = self.latest(kind)
+        if row is None:
+            return None
+        if kind == INCOME:
+            return f"The most recent income is #{self.ids[row]} from {self.descriptions[row]} on {self.dates[row]}."
+        return f"The most recent invoice is #{self.ids[row]} for {self.descriptions[row]} on {self.dates[row]}."
+
+    def total_answer(self, kind):
+        _, total = self.total(kind)
+        if kind == INCOME:
+            return f"Total income: ${total}."
+        return f"Total expenses: ${total}."
+
+    def month_answer(self, kind, month, year=None):
+        if year is None:
+            year = self.resolve_year(month)
+        count, total = self.total(kind, month, year)
+        if count == 0:
+            return None
+        return self._count_answer(kind, self.period_label(year, month), count, total)
+
+    def _count_answer(self, kind, label, count, total):
+        if kind == INCOME:
+            return f"In {label}, there were {count} income entries totaling ${total}."
+        return f"In {label}, there were {count} invoices totaling ${total}."
+
+    def _net_answer(self, label, income, expenses):
+        net = income - expenses
+        if net >= 0:
+            return f"Net profit for {label}: ${net} (Income: ${income}, Expenses: ${expenses})"
+        return f"Net loss for {label}: ${abs(net)} (Income: ${income}, Expenses: ${expenses})"
+
+    def quarter_answer(self, kind, quarter, year=None):
+        year = year or self.resolve_year()
+        if year is None:
+            return None
+        return self._count_answer(kind, self.period_label(year, quarter=quarter), *self.total(kind, year=year, quarter=quarter))
+
+    def year_answer(self, kind, year):
+        if not len(self):
+            return None
+        return self._count_answer(kind, str(year), *self.total(kind, year=year))
+
+    def recent_answer(self, kind, days, today=None):
+        """Count and total of the last days days, up to and including today"""
+        last_day = day_number(*(today or date.today()).timetuple()[:3])
+        first_day = last_day - days + 1
+        since = date.fromordinal(first_day + EPOCH_ORDINAL).strftime('%B %d, %Y')
+        return self._count_answer(kind, f"the last {days} days (since {since})", *self.range_total(kind, first_day, last_day))
+
+    def period_net_answer(self, year=None, quarter=None, days=None, today=None):
+        """Net profit for a quarter, a year or the last days days"""
+        if days is not None:
+            last_day = day_number(*(today or date.today()).timetuple()[:3])
+            first_day = last_day - days + 1
+            label = f"the last {days} days"
+        else:
+            year = year or self.resolve_year()
+            if year is None:
+                return None
+            first_day, last_day = period_days(year, quarter=quarter)
+            label = self.period_label(year, quarter=quarter)
+        _, income = self.range_total(INCOME, first_day, last_day)
+        _, expenses = self.range_total(EXPENSE, first_day, last_day)
+        return self._net_answer(label, income, expenses)
+
+    def record_answer(self, kind, record_id):
+        row = self.find(kind, record_id)
+        if row is None:
+            return None
+        if kind == INCOME:
+            return f"Income #{record_id} is from {self.descriptions[row]} for ${int(self.amount[row])} on {self.dates[row]}."
+        return f"Invoice #{record_id} is for {self.descriptions[row]} for ${int(self.amount[row])} on {self.dates[row]}."
+
+    def net_answer(self):
+        total_income = self.kind_totals[INCOME]
+        total_expenses = self.kind_totals[EXPENSE]
+        net = total_income - total_expenses
+
+        if net >= 0:
+            return f"Net profit: ${net} (Income: ${total_income}, Expenses: ${total_expenses})"
+        return f"Net loss: ${abs(net)} (Income: ${total_income}, Expenses: ${total_expenses})"
+
+    def month_net_answer(self, month, year=None):
+        if year is None:
+            year = self.resolve_year(month)
+        income_count, month_income = self.total(INCOME, month, year)
+        expense_count, month_expenses = self.total(EXPENSE, month, year)
+        if income_count == 0 and expense_count == 0:
+            return None
+
+        label = self.period_label(year, month)
+        month_net = month_income - month_expenses
+        if month_net >= 0:
+            return f"{label} net profit: ${month_net}"
+        return f"{label} net loss: ${abs(month_net)}"
+
+    def month_summary_answer(self, month, year=None):
+        if year is None:
+            year = self.resolve_year(month)
+        income_count, month_income = self.total(INCOME, month, year)
+        expense_count, month_expenses = self.total(EXPENSE, month, year)
+        if income_count == 0 and expense_count == 0:
+            return None
+        return f"In {self.period_label(year, month)}, income: ${month_income}, expenses: ${month_expenses}"
+
+
+# Canonical queries produced by intent_parser.parse_intent that can be
+# answered exactly from the ledger columns, without an embedding round-trip.
+AGGREGATE_QUERIES = [
+    (re.compile(r'^what is the highest (expense|income)$'),
+     lambda ledger, word: ledger.highest_answer(_kind_of(word))),
+    (re.compile(r'^what is the most recent (expense|income)$'),
+     lambda ledger, word: ledger.latest_answer(_kind_of(word))),
+    (re.compile(r'^total (expenses|income)$'),
+     lambda ledger, word: ledger.total_answer(_kind_of(word))),
+    (re.compile(r'^total (expenses|income) in (\d{4})$'),
+     lambda ledger, word, year: ledger.year_answer(_kind_of(word), int(year))),
+    (re.compile(rf'^(expenses|income) in ({_MONTH_PATTERN})(?: (\d{{4}}))?$'),
+     lambda ledger, word, month_name, year: ledger.month_answer(_kind_of(word), _month_of(month_name), _year_of(year))),
+    (re.compile(r'^(expenses|income) in q([1-4])(?: (\d{4}))?$'),
+     lambda ledger, word, quarter, year: ledger.quarter_answer(_kind_of(word), int(quarter), _year_of(year))),
+    (re.compile(r'^(expenses|income) in the last (\d+) days$'),
+     lambda ledger, word, days: ledger.recent_answer(_kind_of(word), int(days))),
+    (re.compile(r'^(invoice|income) #(\d+)$'),
+     lambda ledger, word, record_id: ledger.record_answer(_kind_of(word), record_id)),
+    (re.compile(r'^what is (?:my financial balance|the net profit)$'),
+     lambda ledger: ledger.net_answer()),
+    (re.compile(rf'^net profit for ({_MONTH_PATTERN})(?: (\d{{4}}))?$'),
+     lambda ledger, month_name, year: ledger.month_net_answer(_month_of(month_name), _year_of(year))),
+    (re.compile(r'^net profit for q([1-4])(?: (\d{4}))?$'),
+     lambda ledger, quarter, year: ledger.period_net_answer(_year_of(year), quarter=int(quarter))),
+    (re.compile(r'^net profit for (\d{4})$'),
+     lambda ledger, year: ledger.period_net_answer(int(year))),
+    (re.compile(r'^net profit for the last (\d+) days$'),
+     lambda ledger, days: ledger.period_net_answer(days=int(days))),
+    (re.compile(rf'^financial summary for ({_MONTH_PATTERN})(?: (\d{{4}}))?$'),
+     lambda ledger, month_name, year: ledger.month_summary_answer(_month_of(month_name), _year_of(year))),
+]
+
+class LedgerBuilder:
+    """Accumulates records into compact typed columns and builds a Ledger"""
+
+    def __init__(self):
+        self.ids = []
+        self.dates = EncodedStrings()
+        self.descriptions = EncodedStrings()
+        self.amount = array('q')
+        self.day = array('i')
+        self.month = array('b')
+        self.year = array('h')
+        self.kind = array('b')
+        self.category = array('h')
+        self.category_names = []
+        self._category_codes = {}
+        self._parsed_dates = {}
+
+    def __len__(self):
+        return len(self.amount)
+
+    def add(self, record_type, record_id, date_str, description, amount, category=None):
+        if date_str not in self._parsed_dates:
+            self._parsed_dates[date_str] = _parse_date(date_str)
+        day, month, year = self._parsed_dates[date_str]
+
+        is_income = record_type == 'income'
+        if category is None:
+            category = get_categorizer().categorize('income' if is_income else 'expense', description)
+        if category not in self._category_codes:
+            self._category_codes[category] = len(self.category_names)
+            self.category_names.append(category)
+
+        self.ids.append(record_id)
+        self.dates.append(date_str)
+        self.descriptions.append(description)
+        self.amount.append(amount)
+        self.day.append(day)
+        self.month.append(month)
+        self.year.append(year)
+        self.kind.append(INCOME if is_income else EXPENSE)
+        self.category.append(self._category_codes[category])
+
+    def build(self):
+        return Ledger(
+            ids=self.ids,
+            dates=self.dates,
+            descriptions=self.descriptions,
+            amount=np.array(self.amount, dtype=np.int64),
+            day=np.array(self.day, dtype=np.int32),
+            month=np.array(self.month, dtype=np.int8),
+            year=np.array(self.year, dtype=np.int16),
+            kind=np.array(self.kind, dtype=np.int8),
+            category=np.array(self.category, dtype=np.int16),
+            category_names=self.category_names
+        )
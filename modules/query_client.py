@@ -0,0 +1,68 @@
+import os
+import json
+import socket
+import http.client
+from urllib.parse import urlsplit
+
+DEFAULT_SERVER = "http://127.0.0.1:8765"
+REQUEST_TIMEOUT = 30
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket"""
+
+    def __init__(self, socket_path, timeout=REQUEST_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def _connection():
+    """Connection to the query server named by FINANCE_AGENT_SERVER
+    ("http://host:port", "unix:/path/to.sock" or "off")"""
+    address = os.environ.get("FINANCE_AGENT_SERVER", DEFAULT_SERVER)
+    if address in ("", "off"):
+        return None
+    if address.startswith("unix:"):
+        return UnixHTTPConnection(urlsplit(address).path)
+
+    parsed = urlsplit(address)
+    return http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=REQUEST_TIMEOUT)
+
+def _request(method, path, payload=None):
+    connection = _connection()
+    if connection is None:
+        return None
+
+    try:
+        body = json.dumps(payload) if payload is not None else None
+        connection.request(method, path, body=body, headers={"Content-Type": "application/json"})
+        response = connection.getresponse()
+        if response.status != 200:
+            return None
+        return json.loads(response.read())
+    except (OSError, http.client.HTTPException, ValueError):
+        return None
+    finally:
+        connection.close()
+
+def server_available():
+    """True if a query server is reachable"""
+    return _request("GET", "/health") is not None
+
+def query_server(text):
+    """Send an utterance to the query server.
+
+    Returns {"intent": intent_data, "answer": answer_or_None}, or None when
+    no server is reachable so the caller can answer in-process instead.
+    """
+    return _request("POST", "/query", {"text": text})
+
+def query_server_batch(queries):
+    """Answer canonical queries on the server, or None if it is unreachable"""
+    response = _request("POST", "/answers", {"queries": list(queries)})
+    if response is None:
+        return None
+    return response["answers"]
@@ -0,0 +1,242 @@
+import os
+import json
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from modules.intent_parser import parse_intent
+from modules.rag_engine import initialize_rag
+from modules.tts_cache import prerender_in_background
+from modules.tracing import get_tracer
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BATCH_SIZE = 64
+MAX_BODY_BYTES = 1 << 20
+
+class MicroBatcher:
+    """Groups concurrent retrieval queries into shared get_answers calls.
+
+    Batches run one at a time on a dedicated thread. While a batch is being
+    encoded, newly arriving queries queue up and are taken together as the
+    next batch, so batch size grows with load without adding latency when
+    the server is idle. max_delay optionally waits a little longer for a
+    batch to fill.
+    """
+
+    def __init__(self, engine, max_batch=MAX_BATCH_SIZE, max_delay=0.0):
+        self.engine = engine
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-batch")
+
+    async def submit(self, query):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((query, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            queries = [query for query, _ in batch]
+            try:
+                # Queries only reach the batcher after missing cached_answer()
+                answers = await loop.run_in_executor(self.executor, self.engine.get_answers, queries, False)
+            except Exception as e:
+                answers = [f"I encountered an issue processing your financial query: {str(e)}. Please try again."] * len(batch)
+
+            for (_, future), answer in zip(batch, answers):
+                if not future.done():
+                    future.set_result(answer)
+
+class QueryServer:
+    """Local HTTP query server that keeps the model and index warm.
+
+    Endpoints (JSON over HTTP/1.1, keep-alive supported):
+      POST /query   {"text": "..."}      -> {"intent": {...}, "answer": "..."}
+      POST /answers {"queries": [...]}   -> {"answers": [...]}
+      GET  /health                       -> {"status": "ok", "chunks": N, "answer_cache": {...}}
+      GET  /metrics                      -> stage latencies and counters, Prometheus text format
+
+    Utterances go through parse_intent. Cached and aggregate queries are
+    answered on a worker thread; everything else is micro-batched. Intents
+    other than query_financial_docs are returned without an answer so the
+    client can act on them (e.g. exit).
+    """
+
+    def __init__(self, engine, max_batch=MAX_BATCH_SIZE, max_delay=0.0):
+        self.engine = engine
+        self.batcher = MicroBatcher(engine, max_batch, max_delay)
+
+    async def answer(self, query):
+        # A cache miss falls through to a ledger lookup, which may sort the
+        # record IDs on first use, so it runs off the event loop.
+        loop = asyncio.get_running_loop()
+        answer = await loop.run_in_executor(None, self.engine.cached_answer, query)
+        if answer is not None:
+            return answer
+        return await self.batcher.submit(query)
+
+    async def handle_request(self, method, path, body):
+        if method == "GET" and path == "/health":
+            return 200, {
+                "status": "ok",
+                "chunks": len(self.engine.chunks),
+                "version": self.engine.version,
+                "answer_cache": self.engine.answer_cache.stats()
+            }
+
+        if method == "GET" and path == "/metrics":
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return 404, {"error": "tracing is disabled; set FINANCE_AGENT_TRACE=1"}
+            return 200, tracer.prometheus_text()
+
+        if method != "POST":
+            return 405, {"error": "method not allowed"}
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"error": "invalid JSON body"}
+        if not isinstance(payload, dict):
+            return 400, {"error": "JSON body must be an object"}
+
+        if path == "/query":
+            text = payload.get("text", "")
+            if not isinstance(text, str):
+                return 400, {"error": "\"text\" must be a string"}
+            intent_data = parse_intent(text)
+            answer = None
+            if intent_data["intent"] == "query_financial_docs":
+                answer = await self.answer(intent_data["query"])
+            return 200, {"intent": intent_data, "answer": answer}
+
+        if path == "/answers":
+            queries = payload.get("queries", [])
+            if not isinstance(queries, list) or not all(isinstance(query, str) for query in queries):
+                return 400, {"error": "\"queries\" must be a list of strings"}
+            answers = await asyncio.gather(*(self.answer(query) for query in queries))
+            return 200, {"answers": list(answers)}
+
+        return 404, {"error": "not found"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length", 0) or 0)
+                except ValueError:
+                    length = -1
+                # A body that is not read leaves the stream unframed, so those
+                # errors close the connection
+                if length < 0:
+                    status, response = 400, {"error": "invalid Content-Length"}
+                    headers["connection"] = "close"
+                elif length > MAX_BODY_BYTES:
+                    status, response = 413, {"error": "request body too large"}
+                    headers["connection"] = "close"
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    with get_tracer().stage("server_request"):
+                        status, response = await self.handle_request(method, path, body)
+
+                # Plain-text responses (/metrics) are sent as they are
+                if isinstance(response, str):
+                    data, content_type = response.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    data, content_type = json.dumps(response).encode("utf-8"), "application/json"
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + data
+                )
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+        batch_task = asyncio.create_task(self.batcher.run())
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_socket)
+            print(f"Finance query server listening on unix:{unix_socket}")
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print(f"Finance query server listening on http://{host}:{port}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batch_task.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve financial queries from a warm RAG engine.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix-socket", help="listen on a Unix domain socket instead of TCP")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH_SIZE)
+    parser.add_argument("--max-delay", type=float, default=0.0, help="seconds to wait for a batch to fill")
+    parser.add_argument("--watch", action="store_true", help="tail the statement file for appended lines")
+    parser.add_argument("--prerender", action="store_true", help="pre-render speech for the summary answers after each ingest")
+    args = parser.parse_args()
+
+    engine = initialize_rag()
+    on_refresh = None
+    if args.prerender:
+        prerender_in_background(engine)
+        on_refresh = prerender_in_background
+    if args.watch:
+        engine.watch(on_refresh=on_refresh)
+
+    server = QueryServer(engine, args.max_batch, args.max_delay)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix_socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop_watching()
+
+if __name__ == "__main__":
+    main()
@@ -1,154 +1,286 @@
 import os
+import copy
+import threading
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import re
-import pickle
+from datetime import date
+from typing import NamedTuple
+from modules.embedding_model import LazyEmbeddingModel, BUILD
+from modules.answer_cache import AnswerCache
+from modules.embedding_cache import EmbeddingCache, ledger_fingerprint, normalize_rows
+from modules.ann_index import load_ann_index
+from modules.ledger import Ledger, LedgerBuilder, EXPENSE, INCOME
+from modules.chunk_store import ChunkStore
+from modules.ingest import resolve_statement_files, ingest_statements
+from modules.statement_parser import complete_end, read_appended_lines, parse_line
+from modules.intent_parser import classify
+from modules.tracing import get_tracer
+
+EMBEDDING_MODEL_NAME = 'paraphrase-MiniLM-L3-v2'
+EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
+INT8_SCALE = 127.0
+SCORE_BLOCK_ROWS = 65536
+QUERY_BLOCK_ROWS = 256
+COMPACT_DELTA_ROWS = 10000
+ANSWER_CACHE_SIZE = 1024
+ANN_MIN_ROWS = 100000
+
+class SearchState(NamedTuple):
+    """What scoring reads from the engine, captured under its lock so the
+    matrix products can run without holding it"""
+    chunks: object
+    embeddings: np.ndarray
+    delta: np.ndarray
+    dead_rows: np.ndarray
+    ann: object
+
+def quantize_embeddings(embeddings, dtype):
+    """Convert a normalized float32 matrix to the requested storage dtype"""
+    if dtype == 'float32':
+        return embeddings
+    if dtype == 'float16':
+        return np.asarray(embeddings, dtype=np.float16)
+    if dtype == 'int8':
+        return np.round(np.asarray(embeddings) * INT8_SCALE).astype(np.int8)
+    raise ValueError(f"Unsupported embedding dtype: {dtype}")
+
+def top_k_indices(scores, k):
+    """Indices of the k highest scores along the last axis, best first,
+    without a full sort"""
+    scores = np.asarray(scores)
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(scores.shape[:-1] + (0,), dtype=np.intp)
+    if k < n:
+        candidates = np.argpartition(scores, -k, axis=-1)[..., -k:]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    order = np.argsort(np.take_along_axis(scores, candidates, axis=-1), axis=-1)[..., ::-1]
+    return np.take_along_axis(candidates, order, axis=-1)
+
+def statement_fingerprint(path):
+    """ledger_fingerprint of a statement file plus end, the offset just past
+    its last complete line. Loading reads up to end and tailing resumes
+    there, so a line caught mid-write is read whole once it is finished."""
+    entry = ledger_fingerprint(path)
+    entry['end'] = entry['size'] if path.endswith('.gz') else complete_end(path, entry['size'])
+    return entry
+
+def canonical_query(query):
+    """Case- and whitespace-insensitive form of a query, used as a cache key"""
+    return " ".join(query.lower().split())
 
 class RAGEngine:
-    def __init__(self, file_path=None, force_reload=False):
+    def __init__(self, file_path=None, force_reload=False, embedding_dtype='float32', ingest_workers=None,
+                 answer_cache_size=ANSWER_CACHE_SIZE, answer_cache_ttl=None, index_dir=None,
+                 ann_index=None, ann_min_rows=ANN_MIN_ROWS, embedding_precision=None):
+        if embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {embedding_dtype}")
+        self.embedding_dtype = embedding_dtype
+        self.ingest_workers = ingest_workers
+
         base_dir = os.path.dirname(os.path.dirname(__file__))
-        self.model_cache_path = os.path.join(base_dir, "data/rag_cache.pkl")
+        if index_dir is None:
+            index_dir = os.path.join(base_dir, "data/rag_index")
+        self.index_dir = index_dir
         
         if file_path is None:
             file_path = os.path.join(base_dir, "data/financial_statements.txt")
+        self.file_path = file_path
+
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        self._watch_stop = None
+        self._watch_thread = None
+
+        # Answers are cached per ledger version; every change to the ledger
+        # or index bumps the version and drops the cached answers.
+        self.version = 0
+        self.answer_cache = AnswerCache(answer_cache_size, answer_cache_ttl)
+
+        # Stores with at least ann_min_rows rows are searched through an
+        # approximate index ("ivf", see modules.ann_index) when one is
+        # configured, here or with FINANCE_AGENT_ANN; smaller ones, and rows
+        # added since the store was written, are always scored exactly.
+        self.ann_index = load_ann_index(ann_index) if ann_index is None or isinstance(ann_index, str) else ann_index
+        self.ann_min_rows = ann_min_rows
+        self.ann = None
+
+        # embedding_precision "int8" (or FINANCE_AGENT_EMBEDDING_PRECISION)
+        # runs the model dynamically quantized; see LazyEmbeddingModel.
+        self.embedding_model = LazyEmbeddingModel(EMBEDDING_MODEL_NAME, embedding_precision)
+        self.embedding_cache = EmbeddingCache(self.index_dir, self.embedding_model.cache_name)
+        self._load(force_reload)
+
+    def _load(self, force_reload=False):
+        """(Re)build the ledger, chunks and embeddings from the statement files"""
+        paths = resolve_statement_files(self.file_path)
+        fingerprint = [statement_fingerprint(path) for path in paths]
+
+        if force_reload:
+            self.embedding_cache.clear()
+        else:
+            cached = self.embedding_cache.load(fingerprint)
+            if cached is not None and 'summary_start' in cached[0]:
+                metadata, embeddings = cached
+                ledger = Ledger.load(self.index_dir, tag=fingerprint)
+                chunks = ChunkStore.load(self.index_dir, ledger, tag=fingerprint) if ledger is not None else None
+                if chunks is not None and len(chunks) == len(embeddings):
+                    self._set_state(fingerprint, ledger, chunks, embeddings, metadata['summary_start'])
+                    return
+
+        # Read exactly the complete lines covered by the fingerprint, so
+        # tailing can resume from those offsets without re-reading or
+        # skipping lines.
+        ends = [entry['end'] for entry in fingerprint]
+        ledger, chunks = self._load_and_chunk_document(self.file_path, ends)
+        summary_start = len(chunks)
+        self._add_summary_chunks(ledger, chunks)
+
+        embeddings = self.embedding_cache.encode(
+            self.embedding_model,
+            chunks,
+            metadata={'summary_start': summary_start},
+            fingerprint=fingerprint
+        )
+        self._save_state(fingerprint, ledger, chunks)
+        self._set_state(fingerprint, ledger, chunks, embeddings, summary_start)
+
+    def _save_state(self, fingerprint, ledger, chunks):
+        """Persist the ledger columns and chunk store next to the embeddings,
+        tagged with the statement fingerprint, so a cold start maps them back
+        instead of re-parsing the statements"""
+        ledger.save(self.index_dir, tag=fingerprint)
+        chunks.save(self.index_dir, tag=fingerprint)
+
+    def _set_state(self, fingerprint, ledger, chunks, embeddings, summary_start):
+        summary_rows = {}
+        for row in range(summary_start, len(chunks)):
+            summary_rows.setdefault(chunks[row], []).append(row)
+        ann = self._open_ann(embeddings)
+
+        with self._lock:
+            self.fingerprint = fingerprint
+            self.ledger = ledger
+            self.chunks = chunks
+            self.chunk_embeddings = quantize_embeddings(embeddings, self.embedding_dtype)
+            # Rows appended by refresh() live in a small in-memory segment on
+            # top of the persisted matrix until compact() folds them in, and
+            # superseded summary rows are masked out rather than removed.
+            self._delta_embeddings = np.zeros((0, embeddings.shape[1]), dtype=np.float32)
+            self._summary_rows = summary_rows
+            self._dead_rows = np.zeros(0, dtype=np.intp)
+            self.ann = ann
+            self._bump_version()
+
+    def _open_ann(self, embeddings):
+        """Load the persisted ANN index for the current embedding store, or
+        build and persist one; None when search should stay exact.
+
+        The index is filled in on a copy of self.ann_index, so searches keep
+        using the current one until _set_state swaps it.
+        """
+        if self.ann_index is None or len(embeddings) < self.ann_min_rows:
+            return None
+        source = ledger_fingerprint(self.embedding_cache.embeddings_path)
+        index = copy.copy(self.ann_index)
+        if not index.load(self.index_dir, source):
+            os.makedirs(self.index_dir, exist_ok=True)
+            with get_tracer().stage("ann_build"):
+                index.build(embeddings, previous=self.ann,
+                            vectors_path=os.path.join(self.index_dir, f"ann_vectors.{os.getpid()}.tmp.npy"))
+            index.save(self.index_dir, source)
+        return index
+
+    def _bump_version(self):
+        """Mark the ledger/index as changed; callers hold self._lock"""
+        self.version += 1
+        self.answer_cache.clear()
+    
+    def _load_and_chunk_document(self, file_path, ends=None):
+        """Load document and split into record-level chunks.
 
-        if not force_reload and os.path.exists(self.model_cache_path):
-            with open(self.model_cache_path, 'rb') as f:
-                cache_data = pickle.load(f)
-            
-            self.invoices = cache_data.get('invoices', [])
-            self.incomes = cache_data.get('incomes', [])
-            self.chunks = cache_data['chunks']
-            self.chunk_embeddings = cache_data['chunk_embeddings']
+        file_path may also be a directory or glob of (optionally gzipped)
+        statement files; they are parsed in parallel and merged in sorted
+        path order into one ledger and one ChunkStore. Statement lines and
+        record chunks are stored as references to ledger rows where
+        possible. Summary chunks are added separately by
+        _add_summary_chunks.
+        """
+        chunks = ChunkStore()
+        builder = LedgerBuilder()
 
-            self.embedding_model = SentenceTransformer('paraphrase-MiniLM-L3-v2')
-            return
+        paths = resolve_statement_files(file_path)
+        for statement in ingest_statements(paths, self.ingest_workers, ends):
+            chunks.add_lines(statement.lines, statement.records, len(builder))
 
-        self.embedding_model = SentenceTransformer('paraphrase-MiniLM-L3-v2')
-        self.invoices, self.incomes, self.chunks = self._load_and_chunk_document(file_path)
-        self.chunk_embeddings = self.embedding_model.encode(self.chunks)
-
-        os.makedirs(os.path.dirname(self.model_cache_path), exist_ok=True)
-        with open(self.model_cache_path, 'wb') as f:
-            pickle.dump({
-                'invoices': self.invoices,
-                'incomes': self.incomes,
-                'chunks': self.chunks,
-                'chunk_embeddings': self.chunk_embeddings
-            }, f)
-    
-    def _load_and_chunk_document(self, file_path):
-        """Load document and split into chunks with more detailed processing"""
-        with open(file_path, 'r') as file:
-            text = file.read()
+            for record, category in zip(statement.records, statement.categories):
+                builder.add(record.type, record.id, record.date, record.description, record.amount, category)
 
-        documents = [line.strip() for line in text.split('\n') if line.strip()]
+        ledger = builder.build()
+        chunks.ledger = ledger
 
-        invoices = []
-        incomes = []
-        
-        for doc in documents:
-            invoice_match = re.match(r'Invoice #(\d+) \| (.*?) \| (.*?) \| \$(\d+)', doc)
-            income_match = re.match(r'Income #(\d+) \| (.*?) \| (.*?) \| \$(\d+)', doc)
-            
-            if invoice_match:
-                invoice_id, date, description, amount = invoice_match.groups()
-                invoices.append({
-                    'raw': doc,
-                    'id': invoice_id,
-                    'date': date,
-                    'description': description,
-                    'amount': int(amount),
-                    'type': 'expense'
-                })
-            elif income_match:
-                income_id, date, description, amount = income_match.groups()
-                incomes.append({
-                    'raw': doc,
-                    'id': income_id,
-                    'date': date,
-                    'description': description,
-                    'amount': int(amount),
-                    'type': 'income'
-                })
-
-        chunks = []
-
-        for doc in documents:
-            chunks.append(doc)
-
-        self._add_expense_chunks(invoices, chunks)
-        
-        self._add_income_chunks(incomes, chunks)
+        self._add_record_chunks(ledger, ledger.rows(EXPENSE), chunks)
 
-        self._add_combined_summaries(invoices, incomes, chunks)
+        self._add_record_chunks(ledger, ledger.rows(INCOME), chunks)
         
-        return invoices, incomes, chunks
-    
-    def _add_expense_chunks(self, invoices, chunks):
-        """Add invoice-specific chunks"""
-        for doc in invoices:
-            chunks.append(f"Invoice #{doc['id']} is for {doc['description']} costing ${doc['amount']}")
-            chunks.append(f"{doc['description']} expense of ${doc['amount']} on {doc['date']}")
+        return ledger, chunks
+
+    def _add_record_chunks(self, ledger, rows, chunks):
+        """Add invoice- and income-specific chunks for the given ledger rows"""
+        chunks.add_records(rows)
+
+    def _add_summary_chunks(self, ledger, chunks):
+        """Add summary chunks derived from the ledger aggregates"""
+        self._add_expense_summaries(ledger, chunks)
+
+        self._add_income_summaries(ledger, chunks)
 
-        if invoices:
-            highest = max(invoices, key=lambda x: x['amount'])
-            chunks.append(f"The highest invoice is #{highest['id']} for {highest['description']} at ${highest['amount']}")
+        self._add_combined_summaries(ledger, chunks)
+    
+    def _add_expense_summaries(self, ledger, chunks):
+        """Add invoice summary chunks"""
+        if len(ledger.rows(EXPENSE)):
+            highest = ledger.highest(EXPENSE)
+            chunks.append(f"The highest invoice is #{ledger.ids[highest]} for {ledger.descriptions[highest]} at ${ledger.amount[highest]}")
 
-            latest = max(invoices, key=lambda x: x['date'])
-            chunks.append(f"The most recent invoice is #{latest['id']} for {latest['description']} on {latest['date']}")
+            latest = ledger.latest(EXPENSE)
+            chunks.append(f"The most recent invoice is #{ledger.ids[latest]} for {ledger.descriptions[latest]} on {ledger.dates[latest]}")
 
-            total = sum(doc['amount'] for doc in invoices)
+            _, total = ledger.total(EXPENSE)
             chunks.append(f"The total amount across all invoices is ${total}")
             chunks.append(f"Total expenses: ${total}")
 
-            months = {}
-            for doc in invoices:
-                month = doc['date'].split()[0] 
-                if month not in months:
-                    months[month] = []
-                months[month].append(doc)
-            
-            for month, docs in months.items():
-                month_total = sum(doc['amount'] for doc in docs)
-                chunks.append(f"In {month}, there were {len(docs)} invoices totaling ${month_total}")
-                chunks.append(f"Expenses for {month}: ${month_total}")
+            for year, month in ledger.periods(EXPENSE):
+                count, month_total = ledger.total(EXPENSE, month, year)
+                month_cap = ledger.period_label(year, month)
+                chunks.append(f"In {month_cap}, there were {count} invoices totaling ${month_total}")
+                chunks.append(f"Expenses for {month_cap}: ${month_total}")
     
-    def _add_income_chunks(self, incomes, chunks):
-        """Add income-specific chunks"""
-        for doc in incomes:
-            chunks.append(f"Income #{doc['id']} is from {doc['description']} earning ${doc['amount']}")
-            chunks.append(f"{doc['description']} income of ${doc['amount']} on {doc['date']}")
-        
-        if incomes:
-            highest = max(incomes, key=lambda x: x['amount'])
-            chunks.append(f"The highest income is #{highest['id']} from {highest['description']} at ${highest['amount']}")
+    def _add_income_summaries(self, ledger, chunks):
+        """Add income summary chunks"""
+        if len(ledger.rows(INCOME)):
+            highest = ledger.highest(INCOME)
+            chunks.append(f"The highest income is #{ledger.ids[highest]} from {ledger.descriptions[highest]} at ${ledger.amount[highest]}")
             
-            latest = max(incomes, key=lambda x: x['date'])
-            chunks.append(f"The most recent income is #{latest['id']} from {latest['description']} on {latest['date']}")
+            latest = ledger.latest(INCOME)
+            chunks.append(f"The most recent income is #{ledger.ids[latest]} from {ledger.descriptions[latest]} on {ledger.dates[latest]}")
             
-            total = sum(doc['amount'] for doc in incomes)
+            _, total = ledger.total(INCOME)
             chunks.append(f"The total amount across all income entries is ${total}")
             chunks.append(f"Total income: ${total}")
             
-            months = {}
-            for doc in incomes:
-                month = doc['date'].split()[0]  
-                if month not in months:
-                    months[month] = []
-                months[month].append(doc)
-            
-            for month, docs in months.items():
-                month_total = sum(doc['amount'] for doc in docs)
-                chunks.append(f"In {month}, there were {len(docs)} income entries totaling ${month_total}")
-                chunks.append(f"Income for {month}: ${month_total}")
+            for year, month in ledger.periods(INCOME):
+                count, month_total = ledger.total(INCOME, month, year)
+                month_cap = ledger.period_label(year, month)
+                chunks.append(f"In {month_cap}, there were {count} income entries totaling ${month_total}")
+                chunks.append(f"Income for {month_cap}: ${month_total}")
     
-    def _add_combined_summaries(self, invoices, incomes, chunks):
+    def _add_combined_summaries(self, ledger, chunks):
         """Add combined financial summaries"""
-        if invoices and incomes:
-            total_expenses = sum(doc['amount'] for doc in invoices)
-            total_income = sum(doc['amount'] for doc in incomes)
+        if len(ledger.rows(EXPENSE)) and len(ledger.rows(INCOME)):
+            _, total_expenses = ledger.total(EXPENSE)
+            _, total_income = ledger.total(INCOME)
             net = total_income - total_expenses
             
             chunks.append(f"Total income: ${total_income}, Total expenses: ${total_expenses}")
@@ -158,178 +290,447 @@ class RAGEngine:
             else:
                 chunks.append(f"Net loss: ${abs(net)}")
             
-            months = set()
-            for doc in invoices + incomes:
-                month = doc['date'].split()[0]
-                months.add(month)
-            
-            for month in months:
-                month_expenses = sum(doc['amount'] for doc in invoices if doc['date'].split()[0] == month)
-                month_income = sum(doc['amount'] for doc in incomes if doc['date'].split()[0] == month)
+            for year, month in ledger.periods():
+                _, month_expenses = ledger.total(EXPENSE, month, year)
+                _, month_income = ledger.total(INCOME, month, year)
                 month_net = month_income - month_expenses
+                month_cap = ledger.period_label(year, month)
                 
-                chunks.append(f"In {month}, income: ${month_income}, expenses: ${month_expenses}")
+                chunks.append(f"In {month_cap}, income: ${month_income}, expenses: ${month_expenses}")
                 
                 if month_net >= 0:
-                    chunks.append(f"{month} net profit: ${month_net}")
+                    chunks.append(f"{month_cap} net profit: ${month_net}")
                 else:
-                    chunks.append(f"{month} net loss: ${abs(month_net)}")
+                    chunks.append(f"{month_cap} net loss: ${abs(month_net)}")
     
-    def retrieve(self, query, top_k=3):
-        """Retrieve relevant chunks for the query"""
-        query_embedding = self.embedding_model.encode([query])[0]
-        
-        similarities = cosine_similarity([query_embedding], self.chunk_embeddings)[0]
+    def warm_up(self):
+        """Load the embedding model and run one encode so the first
+        retrieval query does not pay for it"""
+        self.embedding_model.encode(["warm up"])
+
+    def warm_up_in_background(self):
+        """Start warm_up() on a daemon thread and return the thread"""
+        thread = threading.Thread(target=self.warm_up, name="rag-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def refresh(self):
+        """Ingest lines appended to the statement files since the last load.
+
+        Only the new bytes are parsed. The ledger aggregates are updated in
+        place, summary chunks are regenerated from them, and only new or
+        changed chunks are embedded. Truncated, removed or recompressed
+        files fall back to a full reload. Returns the number of new records.
+        """
+        with self._refresh_lock:
+            paths = resolve_statement_files(self.file_path)
+            known = {entry['path']: entry for entry in self.fingerprint}
+            if not set(known) <= {os.path.abspath(path) for path in paths}:
+                self._load()
+                return len(self.ledger)
+
+            fingerprint = []
+            new_lines = []
+            for path in paths:
+                entry = known.get(os.path.abspath(path), {'path': os.path.abspath(path), 'size': 0, 'end': 0})
+                current = ledger_fingerprint(path)
+                if current['size'] == entry['size']:
+                    fingerprint.append(entry)
+                    continue
+                if current['size'] < entry['size'] or path.endswith('.gz'):
+                    self._load()
+                    return len(self.ledger)
+
+                lines, offset = read_appended_lines(path, entry['end'])
+                new_lines.extend(lines)
+                fingerprint.append(dict(current, end=offset))
+
+            if not new_lines:
+                return 0
+
+            builder = LedgerBuilder()
+            records = []
+            for line in new_lines:
+                record = parse_line(line)
+                if record is None:
+                    continue
+                builder.add(record.type, record.id, record.date, record.description, record.amount)
+                records.append(record)
+            appended = builder.build()
+
+            with self._lock:
+                start = len(self.ledger)
+                self.ledger.extend(appended)
+                self._bump_version()
+
+            new_chunks = ChunkStore(self.ledger)
+            new_chunks.add_lines(new_lines, records, start)
+            self._add_record_chunks(self.ledger, np.arange(start, len(self.ledger)), new_chunks)
+
+            summaries = []
+            self._add_summary_chunks(self.ledger, summaries)
+            live_summaries = set(summaries)
+            retired = [row for chunk, rows in self._summary_rows.items() if chunk not in live_summaries for row in rows]
+            new_summaries = list(dict.fromkeys(chunk for chunk in summaries if chunk not in self._summary_rows))
+
+            vectors = normalize_rows(self.embedding_model.encode(list(new_chunks) + new_summaries, purpose=BUILD))
+
+            with self._lock:
+                first_row = len(self.chunks)
+                self.chunks.extend_store(new_chunks)
+                self.chunks.extend(new_summaries)
+                # An empty store has no width yet; the first batch sets it.
+                self._delta_embeddings = np.concatenate([self._delta_embeddings, vectors]) if len(self._delta_embeddings) else vectors
+
+                summary_rows = {chunk: rows for chunk, rows in self._summary_rows.items() if chunk in live_summaries}
+                for row, chunk in enumerate(new_summaries, start=first_row + len(new_chunks)):
+                    summary_rows.setdefault(chunk, []).append(row)
+                self._summary_rows = summary_rows
+                self._dead_rows = np.concatenate([self._dead_rows, np.array(retired, dtype=np.intp)])
+                self.fingerprint = fingerprint
+                self._bump_version()
+
+            return len(appended)
+
+    def compact(self):
+        """Persist rows added by refresh() into the embedding store"""
+        with self._refresh_lock:
+            with self._lock:
+                if len(self._delta_embeddings) == 0 and len(self._dead_rows) == 0:
+                    return
+                chunks = self.chunks
+                base_rows = len(self.chunk_embeddings)
+                delta = self._delta_embeddings
+                record_rows = np.ones(len(chunks), dtype=bool)
+                record_rows[[row for rows in self._summary_rows.values() for row in rows]] = False
+                record_rows[self._dead_rows] = False
+                summary_rows = [rows[0] for rows in self._summary_rows.values()]
+                ledger, fingerprint = self.ledger, self.fingerprint
+
+            # Records in order, then one row per live summary; the new store
+            # shares the arena and only rearranges the entry references.
+            record_rows = np.flatnonzero(record_rows)
+            compacted = chunks.take(np.concatenate([record_rows, np.array(summary_rows, dtype=np.intp)]))
+            precomputed = {chunks[base_rows + row]: vector for row, vector in enumerate(delta)}
+
+            embeddings = self.embedding_cache.encode(
+                self.embedding_model,
+                compacted,
+                metadata={'summary_start': len(record_rows)},
+                fingerprint=fingerprint,
+                precomputed=precomputed
+            )
+            self._save_state(fingerprint, ledger, compacted)
+            self._set_state(fingerprint, ledger, compacted, embeddings, len(record_rows))
+
+    def watch(self, interval=0.5, compact_rows=COMPACT_DELTA_ROWS, on_refresh=None):
+        """Tail the statement files on a background thread, refreshing every
+        interval seconds and compacting once compact_rows rows are pending.
+        on_refresh(engine) is called after each refresh that added records."""
+        if self._watch_thread is not None:
+            return
 
-        top_indices = np.argsort(similarities)[-top_k:][::-1]
+        self._watch_stop = threading.Event()
 
-        top_chunks = [self.chunks[i] for i in top_indices]
-        top_scores = [similarities[i] for i in top_indices]
-        
-        return top_chunks, top_scores
-    
-    def format_answer(self, query, contexts):
-        """Format an answer based on retrieved contexts"""
-        query_lower = query.lower()
-        
-        is_income_query = any(word in query_lower for word in ["income", "revenue", "earnings", "profit", "earned"])
-        is_expense_query = any(word in query_lower for word in ["expense", "invoice", "cost", "spent", "purchase"])
-        is_net_query = any(word in query_lower for word in ["net", "profit and loss", "balance", "bottom line"])
-        
-        if is_income_query and not is_expense_query:
-            if "highest" in query_lower or "largest" in query_lower:
-                for context in contexts:
-                    if "highest income" in context.lower():
-                        return context
+        def run():
+            while not self._watch_stop.wait(interval):
+                try:
+                    if self.refresh() and on_refresh is not None:
+                        on_refresh(self)
+                    if len(self._delta_embeddings) >= compact_rows:
+                        self.compact()
+                except Exception as e:
+                    print(f"Error refreshing financial statements: {e}")
 
-                if self.incomes:
-                    highest = max(self.incomes, key=lambda x: x['amount'])
-                    return f"The highest income is #{highest['id']} from {highest['description']} at ${highest['amount']}."
-            
-            elif "latest" in query_lower or "recent" in query_lower:
-                for context in contexts:
-                    if "most recent income" in context.lower():
-                        return context
+        self._watch_thread = threading.Thread(target=run, name="statement-tail", daemon=True)
+        self._watch_thread.start()
 
-                if self.incomes:
-                    latest = max(self.incomes, key=lambda x: x['date'])
-                    return f"The most recent income is #{latest['id']} from {latest['description']} on {latest['date']}."
-            
-            elif "total" in query_lower:
+    def stop_watching(self):
+        """Stop the tail thread and persist any pending rows"""
+        if self._watch_thread is None:
+            return
+        self._watch_stop.set()
+        self._watch_thread.join()
+        self._watch_thread = None
+        self.compact()
+
+    def _search_state(self):
+        """SearchState of the current index. refresh() and compact() replace
+        these arrays rather than writing into them, and only append to the
+        chunk store, so the snapshot stays valid after the lock is released."""
+        with self._lock:
+            return SearchState(self.chunks, self.chunk_embeddings, self._delta_embeddings, self._dead_rows, self.ann)
+
+    def _score(self, query_embeddings, state):
+        """Cosine similarity of normalized queries against every chunk.
+
+        Chunk embeddings are normalized at build time, so this is one matrix
+        product. Reduced-precision matrices are upcast block by block to keep
+        the temporary bounded while still using BLAS. Rows appended by
+        refresh() are scored from the in-memory segment and retired summary
+        rows score -inf.
+        """
+        queries = normalize_rows(np.atleast_2d(query_embeddings))
+        matrix = state.embeddings
+
+        if len(matrix) == 0:
+            scores = np.zeros((len(queries), 0), dtype=np.float32)
+        elif matrix.dtype == np.float32:
+            scores = queries @ matrix.T
+        else:
+            scores = np.empty((len(queries), len(matrix)), dtype=np.float32)
+            for start in range(0, len(matrix), SCORE_BLOCK_ROWS):
+                block = matrix[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+                scores[:, start:start + len(block)] = queries @ block.T
+            if matrix.dtype == np.int8:
+                scores /= INT8_SCALE
+
+        if len(state.delta):
+            scores = np.concatenate([scores, queries @ state.delta.T], axis=1)
+        if len(state.dead_rows):
+            scores[:, state.dead_rows] = -np.inf
+        return scores
+
+    def _score_rows(self, matrix, query, rows):
+        """Scores of one normalized query against the given stored rows"""
+        block = matrix[rows]
+        if block.dtype == np.float32:
+            return block @ query
+        scores = block.astype(np.float32) @ query
+        if block.dtype == np.int8:
+            scores /= INT8_SCALE
+        return scores
+
+    def _search_approximate(self, query_embeddings, top_k, state):
+        """Top chunks per query among the ANN index's best stored rows and the
+        rows added since the store was written, skipping retired rows.
+
+        The index's picks are re-scored against the engine's own matrix, so
+        scores match exact search at the configured embedding dtype.
+        """
+        queries = normalize_rows(np.atleast_2d(query_embeddings))
+        base_rows = len(state.embeddings)
+        delta_rows = np.arange(base_rows, base_rows + len(state.delta))
+
+        results = []
+        for query, rows in zip(queries, state.ann.search(queries, top_k + len(state.dead_rows))):
+            rows = np.sort(rows)
+            scores = self._score_rows(state.embeddings, query, rows)
+            if len(delta_rows):
+                rows = np.concatenate([rows, delta_rows])
+                scores = np.concatenate([scores, state.delta @ query])
+            if len(state.dead_rows):
+                scores[np.isin(rows, state.dead_rows)] = -np.inf
+            best = top_k_indices(scores, top_k)
+            results.append(([state.chunks[rows[i]] for i in best], [scores[i] for i in best]))
+        return results
+
+    def retrieve_many(self, queries, top_k=3):
+        """Retrieve relevant chunks for several queries with one encode call.
+
+        Returns a (chunks, scores) pair per query, in input order. Queries are
+        scored in blocks so the score matrix stays bounded for large batches,
+        or only against their ANN candidates when an index is in use.
+        """
+        queries = list(queries)
+        if not queries:
+            return []
+
+        tracer = get_tracer()
+        with tracer.stage("encode"):
+            query_embeddings = self.embedding_model.encode(queries)
+
+        results = []
+        state = self._search_state()
+        with tracer.stage("score"):
+            if state.ann is not None:
+                results = self._search_approximate(query_embeddings, top_k, state)
+                tracer.count("chunks_retrieved", sum(len(top_chunks) for top_chunks, _ in results))
+                return results
+
+            for start in range(0, len(queries), QUERY_BLOCK_ROWS):
+                similarities = self._score(query_embeddings[start:start + QUERY_BLOCK_ROWS], state)
+                top_indices = top_k_indices(similarities, top_k)
+
+                for row_scores, row_indices in zip(similarities, top_indices):
+                    top_chunks = [state.chunks[i] for i in row_indices]
+                    top_scores = [row_scores[i] for i in row_indices]
+                    results.append((top_chunks, top_scores))
+                    tracer.count("chunks_retrieved", len(top_chunks))
+
+        return results
+
+    def retrieve(self, query, top_k=3):
+        """Retrieve relevant chunks for the query"""
+        return self.retrieve_many([query], top_k=top_k)[0]
+    
+    def format_answer(self, query, contexts, intent=None):
+        """Format an answer based on retrieved contexts and the classified intent"""
+        if intent is None:
+            intent = classify(query)
+
+        if intent.measure == "record":
+            kind = INCOME if intent.entity == "income" else EXPENSE
+            answer = self.ledger.record_answer(kind, intent.record_id)
+            if answer is not None:
+                return answer
+
+        elif intent.entity is not None:
+            kind = INCOME if intent.entity == "income" else EXPENSE
+            label = "income" if kind == INCOME else "invoice"
+
+            if intent.measure == "highest":
                 for context in contexts:
-                    if "total income" in context.lower():
+                    if f"highest {label}" in context.lower():
                         return context
 
-                total = sum(doc['amount'] for doc in self.incomes)
-                return f"Total income: ${total}."
+                if self.ledger.highest(kind) is not None:
+                    return self.ledger.highest_answer(kind)
 
-            for month in ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"]:
-                if month in query_lower:
-                    month_cap = month.capitalize()
-                    month_docs = [doc for doc in self.incomes if month_cap in doc.get('date', '')]
-                    if month_docs:
-                        total = sum(doc['amount'] for doc in month_docs)
-                        return f"In {month_cap}, there were {len(month_docs)} income entries totaling ${total}."
-
-        elif is_expense_query and not is_income_query:
-            if "highest" in query_lower or "largest" in query_lower:
-                for context in contexts:
-                    if "highest invoice" in context.lower():
-                        return context
-                
-                if self.invoices:
-                    highest = max(self.invoices, key=lambda x: x['amount'])
-                    return f"The highest invoice is #{highest['id']} for {highest['description']} at ${highest['amount']}."
-            
-            elif "latest" in query_lower or "recent" in query_lower:
+            elif intent.measure == "latest":
                 for context in contexts:
-                    if "most recent invoice" in context.lower():
+                    if f"most recent {label}" in context.lower():
                         return context
 
-                if self.invoices:
-                    latest = max(self.invoices, key=lambda x: x['date'])
-                    return f"The most recent invoice is #{latest['id']} for {latest['description']} on {latest['date']}."
-            
-            elif "total" in query_lower:
+                if self.ledger.latest(kind) is not None:
+                    return self.ledger.latest_answer(kind)
+
+            elif intent.measure == "total":
+                totals = ("total income",) if kind == INCOME else ("total expenses", "total amount across all invoices")
                 for context in contexts:
-                    if "total expenses" in context.lower() or "total amount across all invoices" in context.lower():
+                    if any(total in context.lower() for total in totals):
                         return context
 
-                total = sum(doc['amount'] for doc in self.invoices)
-                return f"Total expenses: ${total}."
+                return self.ledger.total_answer(kind)
 
-            for month in ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december"]:
-                if month in query_lower:
-                    month_cap = month.capitalize()
-                    month_docs = [doc for doc in self.invoices if month_cap in doc.get('date', '')]
-                    if month_docs:
-                        total = sum(doc['amount'] for doc in month_docs)
-                        return f"In {month_cap}, there were {len(month_docs)} invoices totaling ${total}."
+            elif intent.measure == "month":
+                answer = self.ledger.month_answer(kind, intent.month, intent.year)
+                if answer is not None:
+                    return answer
 
-        elif is_net_query or ("total" in query_lower and not is_income_query and not is_expense_query):
+        elif intent.measure in ("net", "total"):
             for context in contexts:
                 if "net profit" in context.lower() or "net loss" in context.lower():
                     return context
 
-            total_income = sum(doc['amount'] for doc in self.incomes)
-            total_expenses = sum(doc['amount'] for doc in self.invoices)
-            net = total_income - total_expenses
-            
-            if net >= 0:
-                return f"Net profit: ${net} (Income: ${total_income}, Expenses: ${total_expenses})"
-            else:
-                return f"Net loss: ${abs(net)} (Income: ${total_income}, Expenses: ${total_expenses})"
-
-        if ("invoice" in query_lower or "income" in query_lower) and "#" in query_lower:
-            id_match = re.search(r'#(\d+)', query_lower)
-            if id_match:
-                id_num = id_match.group(1)
-                
-                if "invoice" in query_lower:
-                    for doc in self.invoices:
-                        if doc.get('id') == id_num:
-                            return f"Invoice #{id_num} is for {doc['description']} for ${doc['amount']} on {doc['date']}."
-                
-                elif "income" in query_lower:
-                    for doc in self.incomes:
-                        if doc.get('id') == id_num:
-                            return f"Income #{id_num} is from {doc['description']} for ${doc['amount']} on {doc['date']}."
+            return self.ledger.net_answer()
 
         if contexts and len(contexts) > 0:
             return contexts[0]
         
         return "I couldn't find relevant information about that in your financial records."
 
+    def _answer_from_chunks(self, query, top_chunks, top_scores):
+        filtered_chunks = [chunk for chunk, score in zip(top_chunks, top_scores) if score > 0.2]
+        tracer = get_tracer()
+        tracer.count("chunks_used", len(filtered_chunks))
+        
+        if not filtered_chunks:
+            return "I couldn't find relevant financial information for your query."
+
+        with tracer.stage("format_answer"):
+            return self.format_answer(query, filtered_chunks)
+
+    def structured_answer(self, query):
+        """Answer an aggregate query from the ledger, or None if retrieval is needed"""
+        with self._lock:
+            return self.ledger.answer(query)
+
+    def _cache_key(self, query):
+        """Key of a query's cached answer. "Last N days" answers move with the
+        calendar, so their key includes today's date."""
+        query = canonical_query(query)
+        day = date.today() if classify(query).days is not None else None
+        with self._lock:
+            return (query, self.version, day)
+
+    def cached_answer(self, query):
+        """Answer from the answer cache or the ledger, or None if retrieval is needed"""
+        tracer = get_tracer()
+        key = self._cache_key(query)
+        answer = self.answer_cache.get(key)
+        if answer is not None:
+            tracer.count("answer_cache_hit")
+            return answer
+
+        tracer.count("answer_cache_miss")
+        with tracer.stage("ledger_answer"):
+            answer = self.structured_answer(query)
+        if answer is not None:
+            self.answer_cache.put(key, answer)
+        return answer
+
     def get_answer(self, query):
         """Main method to get answer for a query"""
         try:
-            top_chunks, top_scores = self.retrieve(query, top_k=5)  
+            answer = self.cached_answer(query)
+            if answer is not None:
+                return answer
 
-            filtered_chunks = [chunk for chunk, score in zip(top_chunks, top_scores) if score > 0.2]
-            
-            if not filtered_chunks:
-                return "I couldn't find relevant financial information for your query."
+            key = self._cache_key(query)
+            top_chunks, top_scores = self.retrieve(query, top_k=5)  
 
-            answer = self.format_answer(query, filtered_chunks)
-            
+            answer = self._answer_from_chunks(query, top_chunks, top_scores)
+            self.answer_cache.put(key, answer)
             return answer
             
         except Exception as e:
             return f"I encountered an issue processing your financial query: {str(e)}. Please try again."
 
+    def get_answers(self, queries, check_cache=True):
+        """Answer a batch of queries with a single encode call, in input order.
+
+        Cached and aggregate queries are answered without encoding, unless
+        check_cache is False because the caller already tried cached_answer().
+        """
+        queries = list(queries)
+        answers = [None] * len(queries)
+        pending = []
+        for position, query in enumerate(queries):
+            if check_cache:
+                try:
+                    answers[position] = self.cached_answer(query)
+                except Exception as e:
+                    answers[position] = f"I encountered an issue processing your financial query: {str(e)}. Please try again."
+            if answers[position] is None:
+                pending.append(position)
+
+        if not pending:
+            return answers
+
+        keys = [self._cache_key(queries[position]) for position in pending]
+        try:
+            retrieved = self.retrieve_many([queries[position] for position in pending], top_k=5)
+        except Exception as e:
+            for position in pending:
+                answers[position] = f"I encountered an issue processing your financial query: {str(e)}. Please try again."
+            return answers
+
+        for position, key, (top_chunks, top_scores) in zip(pending, keys, retrieved):
+            try:
+                answers[position] = self._answer_from_chunks(queries[position], top_chunks, top_scores)
+                self.answer_cache.put(key, answers[position])
+            except Exception as e:
+                answers[position] = f"I encountered an issue processing your financial query: {str(e)}. Please try again."
+        
+        return answers
 
 _rag_engine = None
+_rag_engine_lock = threading.Lock()
 
 def initialize_rag():
     """Initialize the RAG engine if not already initialized"""
     global _rag_engine
     if _rag_engine is None:
-        _rag_engine = RAGEngine()
+        with _rag_engine_lock:
+            if _rag_engine is None:
+                _rag_engine = RAGEngine()
     return _rag_engine
 
 def get_rag_answer(query: str):
     """Get answer from RAG engine, initializing if necessary"""
-    global _rag_engine
-    if _rag_engine is None:
-        _rag_engine = RAGEngine()
-    return _rag_engine.get_answer(query)
\ No newline at end of file
+    return initialize_rag().get_answer(query)
+
+def get_rag_answers(queries):
+    """Get answers for a batch of queries from the RAG engine, in input order"""
+    return initialize_rag().get_answers(queries)
\ No newline at end of file
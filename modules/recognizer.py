@@ -0,0 +1,293 @@
+import os
+import json
+import time
+import wave
+import importlib
+import numpy as np
+from modules.tracing import get_tracer
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+SAMPLE_WIDTH = 2
+BARGE_IN_RMS = float(os.environ.get("FINANCE_AGENT_BARGE_IN_RMS", "") or 3000.0)
+
+class RecognitionError(Exception):
+    """The speech recognition service or engine failed"""
+
+def frame_rms(frame):
+    """Root-mean-square level of a 16-bit PCM frame"""
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+    return float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+
+class EnergyVAD:
+    """Energy-based voice activity detector for 16-bit mono PCM frames.
+
+    The noise floor adapts while nobody is speaking. Speech starts after
+    start_frames consecutive loud frames and the utterance ends after
+    end_silence_ms of quiet, so capture stops as soon as the speaker does
+    instead of waiting out a fixed timeout.
+    """
+
+    def __init__(self, frame_ms=FRAME_MS, start_frames=3, end_silence_ms=600,
+                 min_rms=300.0, speech_ratio=3.0, max_utterance_ms=15000):
+        self.start_frames = start_frames
+        self.end_frames = max(1, end_silence_ms // frame_ms)
+        self.max_frames = max_utterance_ms // frame_ms
+        self.min_rms = min_rms
+        self.speech_ratio = speech_ratio
+        self.noise_rms = None
+        self.reset()
+
+    def reset(self):
+        self.in_speech = False
+        self._voiced = 0
+        self._silent = 0
+        self._frames = 0
+
+    def is_voiced(self, frame):
+        rms = frame_rms(frame)
+        threshold = max(self.min_rms, (self.noise_rms or 0.0) * self.speech_ratio)
+        voiced = rms > threshold
+        if not voiced and not self.in_speech:
+            self.noise_rms = rms if self.noise_rms is None else 0.95 * self.noise_rms + 0.05 * rms
+        return voiced
+
+    def update(self, frame):
+        """Feed one frame; returns True once the utterance has ended"""
+        voiced = self.is_voiced(frame)
+        if not self.in_speech:
+            self._voiced = self._voiced + 1 if voiced else 0
+            if self._voiced >= self.start_frames:
+                self.in_speech = True
+            return False
+
+        self._frames += 1
+        self._silent = 0 if voiced else self._silent + 1
+        return self._silent >= self.end_frames or self._frames >= self.max_frames
+
+class BargeInVAD(EnergyVAD):
+    """EnergyVAD for listening while the agent may still be talking.
+
+    While playing() is true, an utterance only starts on frames louder than
+    barge_in_rms, so the agent's own voice picked up by the microphone does
+    not count as the user interrupting it, and the noise floor is not
+    learned from it. Once the user is speaking the usual thresholds apply.
+    """
+
+    def __init__(self, playing, barge_in_rms=BARGE_IN_RMS, **kwargs):
+        super().__init__(**kwargs)
+        self.playing = playing
+        self.barge_in_rms = barge_in_rms
+
+    def is_voiced(self, frame):
+        if self.in_speech or not self.playing():
+            return super().is_voiced(frame)
+        return frame_rms(frame) > self.barge_in_rms
+
+class VoskRecognizer:
+    """Offline, CPU-only streaming recognizer backed by a Vosk model.
+
+    Requires the optional vosk package and a model directory from
+    https://alphacephei.com/vosk/models.
+    """
+    streaming = True
+
+    def __init__(self, model_path):
+        try:
+            from vosk import Model, SetLogLevel
+        except ImportError:
+            raise RecognitionError("Offline recognition needs the vosk package (pip install vosk)")
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+
+    def session(self, sample_rate=SAMPLE_RATE):
+        return VoskSession(self.model, sample_rate)
+
+class VoskSession:
+    def __init__(self, model, sample_rate):
+        from vosk import KaldiRecognizer
+        self.recognizer = KaldiRecognizer(model, sample_rate)
+        self.text = []
+
+    def accept(self, frame):
+        """Feed PCM audio; returns the transcript so far"""
+        if self.recognizer.AcceptWaveform(frame):
+            self.text.append(json.loads(self.recognizer.Result()).get("text", ""))
+            partial = ""
+        else:
+            partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        return " ".join(part for part in self.text + [partial] if part)
+
+    def finish(self):
+        self.text.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        return " ".join(part for part in self.text if part)
+
+class GoogleRecognizer:
+    """Google Web Speech recognizer; audio is buffered and sent once the
+    utterance ends, so it produces no partial transcripts"""
+    streaming = False
+
+    def session(self, sample_rate=SAMPLE_RATE):
+        return GoogleSession(sample_rate)
+
+class GoogleSession:
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.frames = []
+
+    def accept(self, frame):
+        self.frames.append(frame)
+        return ""
+
+    def finish(self):
+        import speech_recognition as sr
+
+        audio = sr.AudioData(b"".join(self.frames), self.sample_rate, SAMPLE_WIDTH)
+        try:
+            return sr.Recognizer().recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+        except sr.RequestError as e:
+            raise RecognitionError(f"Error with service: {e}")
+
+def load_recognizer(spec=None):
+    """Build a recognizer from "google", "vosk:/path/to/model", "vosk"
+    (model path from FINANCE_AGENT_VOSK_MODEL) or "package.module:Factory"
+    for any object with session(sample_rate). Defaults to FINANCE_AGENT_ASR,
+    else Vosk when FINANCE_AGENT_VOSK_MODEL is set, else Google."""
+    default = "vosk" if os.environ.get("FINANCE_AGENT_VOSK_MODEL") else "google"
+    spec = spec or os.environ.get("FINANCE_AGENT_ASR") or default
+    if spec == "google":
+        return GoogleRecognizer()
+    if spec.startswith("vosk"):
+        model_path = spec.partition(":")[2] or os.environ.get("FINANCE_AGENT_VOSK_MODEL")
+        if not model_path:
+            raise RecognitionError("Set FINANCE_AGENT_VOSK_MODEL or use vosk:/path/to/model")
+        return VoskRecognizer(model_path)
+    if ":" in spec:
+        module_name, _, attribute = spec.partition(":")
+        return getattr(importlib.import_module(module_name), attribute)()
+    raise RecognitionError(f"Unknown speech recognizer: {spec}")
+
+def microphone_frames(sample_rate=SAMPLE_RATE, frame_ms=FRAME_MS):
+    """Yield 16-bit mono PCM frames from the default microphone"""
+    import pyaudio
+
+    frame_samples = sample_rate * frame_ms // 1000
+    audio = pyaudio.PyAudio()
+    stream = audio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate,
+                        input=True, frames_per_buffer=frame_samples)
+    try:
+        while True:
+            yield stream.read(frame_samples, exception_on_overflow=False)
+    finally:
+        stream.stop_stream()
+        stream.close()
+        audio.terminate()
+
+def to_pcm16_mono(data, sample_width, channels):
+    """Convert interleaved PCM of any common width to 16-bit mono"""
+    if sample_width == SAMPLE_WIDTH and channels == 1:
+        return data
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.int32) - 128) << 8
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype=np.int16).astype(np.int32)
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype=np.int32) >> 16
+    else:
+        raise RecognitionError(f"Unsupported WAV sample width: {sample_width * 8} bits")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples.astype(np.int16).tobytes()
+
+def wav_frames(source, frame_ms=FRAME_MS):
+    """(sample_rate, frames) of 16-bit mono PCM for a .wav path or file object"""
+    wav = wave.open(source, "rb")
+    sample_rate = wav.getframerate()
+    sample_width, channels = wav.getsampwidth(), wav.getnchannels()
+    frame_samples = sample_rate * frame_ms // 1000
+
+    def frames():
+        with wav:
+            while True:
+                frame = wav.readframes(frame_samples)
+                if not frame:
+                    break
+                yield to_pcm16_mono(frame, sample_width, channels)
+
+    return sample_rate, frames()
+
+def transcribe_stream(recognizer, frames, sample_rate=SAMPLE_RATE, vad=None, on_partial=None, pre_roll=10):
+    """Transcribe one utterance from an iterator of PCM frames.
+
+    Leading silence is skipped (keeping pre_roll frames before speech
+    starts), frames are fed to the recognizer as they arrive, and capture
+    stops at the VAD endpoint. on_partial(text) is called whenever the
+    partial transcript changes. Returns the final transcript, "" if nothing
+    was recognized. Decoding time and the time from the endpoint to the
+    final transcript are recorded as the asr_decode and asr_finalize stages.
+    """
+    tracer = get_tracer()
+    vad = vad or EnergyVAD()
+    vad.reset()
+    session = recognizer.session(sample_rate)
+    leading = []
+    partial = ""
+    decode_seconds = 0.0
+
+    for frame in frames:
+        if not vad.in_speech:
+            leading = (leading + [frame])[-pre_roll:]
+            vad.update(frame)
+            if not vad.in_speech:
+                continue
+            chunk, leading = b"".join(leading), []
+            ended = False
+        else:
+            chunk = frame
+            ended = vad.update(frame)
+
+        started = time.perf_counter()
+        text = session.accept(chunk)
+        decode_seconds += time.perf_counter() - started
+        if text and text != partial:
+            partial = text
+            if on_partial is not None:
+                on_partial(partial)
+        if ended:
+            break
+
+    if not vad.in_speech:
+        return ""
+    tracer.record("asr_decode", decode_seconds)
+    with tracer.stage("asr_finalize"):
+        return session.finish().strip()
+
+def transcribe_wav(recognizer, source, on_partial=None):
+    """Transcribe a .wav path or file object in full. A file is already a
+    complete recording, so there is no endpointing or loudness gate: every
+    frame goes to the recognizer, pauses and quiet speech included. Returns
+    "" for a file with no audio."""
+    tracer = get_tracer()
+    sample_rate, frames = wav_frames(source)
+    session = recognizer.session(sample_rate)
+    partial = ""
+    decode_seconds = 0.0
+    fed = False
+
+    for frame in frames:
+        fed = True
+        started = time.perf_counter()
+        text = session.accept(frame)
+        decode_seconds += time.perf_counter() - started
+        if text and text != partial:
+            partial = text
+            if on_partial is not None:
+                on_partial(partial)
+
+    if not fed:
+        return ""
+    tracer.record("asr_decode", decode_seconds)
+    with tracer.stage("asr_finalize"):
+        return session.finish().strip()
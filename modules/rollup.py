@@ -0,0 +1,80 @@
+import numpy as np
+
+class Rollup:
+    """Prefix sums of daily record counts and amounts for several series.
+
+    Days are integer day numbers (days since 1970-01-01). For each series
+    the counts and amounts of every day in [start_day, start_day + capacity)
+    are kept alongside their running totals, so the count and total for any
+    inclusive day range - a month, a quarter, a year, the last 90 days - is
+    two lookups and a subtraction. add() only re-accumulates the prefix
+    from the earliest day it touches, which for appended records is the
+    tail of the arrays.
+    """
+
+    def __init__(self, series=1):
+        self.start_day = None
+        self._daily = np.zeros((2, series, 0), dtype=np.int64)
+        self._prefix = np.zeros((2, series, 1), dtype=np.int64)
+
+    @property
+    def series(self):
+        return self._daily.shape[1]
+
+    @property
+    def days(self):
+        return self._daily.shape[2]
+
+    def _reserve(self, series, first_day, last_day):
+        """Grow the arrays to cover series rows and [first_day, last_day]"""
+        if self.start_day is None:
+            self.start_day = first_day
+        start_day = min(self.start_day, first_day)
+        end_day = max(self.start_day + self.days, last_day + 1)
+        series = max(series, self.series)
+        if start_day == self.start_day and end_day <= self.start_day + self.days and series == self.series:
+            return
+
+        if end_day > self.start_day + self.days:
+            # Appends usually land past the end; leave room for more.
+            end_day = max(end_day, start_day + 2 * (end_day - start_day))
+        offset = self.start_day - start_day
+        daily = np.zeros((2, series, end_day - start_day), dtype=np.int64)
+        daily[:, :self.series, offset:offset + self.days] = self._daily
+        prefix = np.zeros((2, series, end_day - start_day + 1), dtype=np.int64)
+        prefix[:, :self.series, offset:offset + self.days + 1] = self._prefix
+        prefix[:, :self.series, offset + self.days + 1:] = self._prefix[:, :, -1:]
+
+        self.start_day = start_day
+        self._daily = daily
+        self._prefix = prefix
+
+    def add(self, series, days, amounts):
+        """Add records given as parallel arrays of series index, day number
+        and amount"""
+        series = np.asarray(series, dtype=np.intp)
+        days = np.asarray(days, dtype=np.int64)
+        if len(days) == 0:
+            return
+
+        first_day = int(days.min())
+        self._reserve(int(series.max()) + 1, first_day, int(days.max()))
+
+        offsets = days - self.start_day
+        np.add.at(self._daily[0], (series, offsets), 1)
+        np.add.at(self._daily[1], (series, offsets), np.asarray(amounts, dtype=np.int64))
+
+        first = first_day - self.start_day
+        np.cumsum(self._daily[:, :, first:], axis=2, out=self._prefix[:, :, first + 1:])
+        self._prefix[:, :, first + 1:] += self._prefix[:, :, first:first + 1]
+
+    def total(self, series, first_day, last_day):
+        """(count, total amount) of a series over an inclusive day range"""
+        if self.start_day is None or series >= self.series:
+            return 0, 0
+        first = min(max(first_day - self.start_day, 0), self.days)
+        last = min(max(last_day + 1 - self.start_day, 0), self.days)
+        if last <= first:
+            return 0, 0
+        count, total = self._prefix[:, series, last] - self._prefix[:, series, first]
+        return int(count), int(total)
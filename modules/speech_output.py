@@ -1,21 +1,148 @@
-from gtts import gTTS
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "1"
-import pygame
-import tempfile
+import re
+import queue
+import threading
+from modules.tts_cache import get_tts_cache
 
-def speak_text(text):
-    tts = gTTS(text)
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as fp:
-        tts.save(fp.name)
-        audio_file = fp.name
+PLAYBACK_POLL_SECONDS = 0.05
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
 
-    pygame.mixer.init()
-    pygame.mixer.music.load(audio_file)
-    pygame.mixer.music.play()
+def split_sentences(text):
+    """Split text into sentence-sized segments for pipelined synthesis"""
+    return [segment.strip() for segment in SENTENCE_BOUNDARY.split(text) if segment.strip()]
 
-    while pygame.mixer.music.get_busy():
-        continue
+class SpeechPlayer:
+    """Background speech pipeline: one thread synthesizes sentence segments
+    through the TTS cache while another plays them on a mixer that stays
+    initialized for the life of the process.
 
-    pygame.mixer.quit()
-    os.remove(audio_file)
+    speak() returns immediately, so playback of the first sentence starts
+    while the rest are still being synthesized and the caller can go back
+    to listening. stop() cuts playback off and drops anything queued
+    (barge-in); wait() blocks until everything queued has been spoken.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache
+        self._segments = queue.Queue()
+        self._clips = queue.Queue()
+        self._generation = 0
+        self._pending = 0
+        self._idle = threading.Condition()
+        self._interrupt = threading.Event()
+        self._threads = None
+        self._start_lock = threading.Lock()
+
+    def _start(self):
+        with self._start_lock:
+            if self._threads is None:
+                self._threads = [
+                    threading.Thread(target=self._synthesize_loop, name="speech-synthesis", daemon=True),
+                    threading.Thread(target=self._play_loop, name="speech-playback", daemon=True)
+                ]
+                for thread in self._threads:
+                    thread.start()
+
+    @property
+    def is_speaking(self):
+        return self._pending > 0
+
+    def speak(self, text):
+        """Queue text to be spoken and return without waiting"""
+        segments = split_sentences(text)
+        if not segments:
+            return
+        self._start()
+
+        with self._idle:
+            generation = self._generation
+            self._pending += len(segments)
+        for segment in segments:
+            self._segments.put((generation, segment))
+
+    def stop(self):
+        """Interrupt the current playback and discard queued segments"""
+        with self._idle:
+            self._generation += 1
+        self._interrupt.set()
+
+    def wait(self, timeout=None):
+        """Block until everything queued has been spoken or stopped"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def _done(self):
+        with self._idle:
+            self._pending -= 1
+            if self._pending == 0:
+                self._idle.notify_all()
+
+    def _synthesize_loop(self):
+        cache = self.cache or get_tts_cache()
+        while True:
+            generation, segment = self._segments.get()
+            if generation != self._generation:
+                self._done()
+                continue
+            try:
+                self._clips.put((generation, cache.audio_path(segment)))
+            except Exception as e:
+                print(f"⚠️ Error synthesizing speech: {e}")
+                self._done()
+
+    def _play_loop(self):
+        import pygame
+
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            print(f"⚠️ Audio output unavailable: {e}")
+            pygame = None
+
+        while True:
+            generation, audio_file = self._clips.get()
+            try:
+                if pygame is None or generation != self._generation:
+                    continue
+                # stop() may have set the event while nothing was playing; a
+                # stop after this point also changes the generation, which
+                # the loop below checks.
+                self._interrupt.clear()
+                pygame.mixer.music.load(audio_file)
+                pygame.mixer.music.play()
+                while pygame.mixer.music.get_busy() and generation == self._generation:
+                    self._interrupt.wait(PLAYBACK_POLL_SECONDS)
+                if generation != self._generation:
+                    pygame.mixer.music.stop()
+            except Exception as e:
+                print(f"⚠️ Error playing speech: {e}")
+            finally:
+                self._done()
+
+_speech_player = None
+_speech_player_lock = threading.Lock()
+
+def get_speech_player():
+    global _speech_player
+    if _speech_player is None:
+        with _speech_player_lock:
+            if _speech_player is None:
+                _speech_player = SpeechPlayer()
+    return _speech_player
+
+def speak_text(text, block=True):
+    """Speak text, by default waiting until it has been played"""
+    player = get_speech_player()
+    player.speak(text)
+    if block:
+        player.wait()
+
+def is_speaking():
+    """Whether any speech is playing or queued"""
+    return _speech_player is not None and _speech_player.is_speaking
+
+def stop_speaking():
+    """Barge-in: stop any speech that is playing or queued"""
+    if _speech_player is not None:
+        _speech_player.stop()
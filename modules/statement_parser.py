@@ -0,0 +1,112 @@
+import os
+import re
+import gzip
+from typing import NamedTuple
+
+READ_BUFFER_SIZE = 1 << 20
+
+# One pattern for both line forms, e.g.
+#   Invoice #001 | January 05, 2024 | Office Rent | $550
+#   Income #001 | January 10, 2024 | Client A - Website Design | $1500
+LEDGER_LINE = re.compile(r'(Invoice|Income) #(\d+) \| (.*?) \| (.*?) \| \$(\d+)')
+
+RECORD_TYPES = {'Invoice': 'expense', 'Income': 'income'}
+
+class LedgerRecord(NamedTuple):
+    """A single parsed ledger line"""
+    type: str
+    id: str
+    date: str
+    description: str
+    amount: int
+    line: str
+
+def open_statement(file_path):
+    """Open a statement file for reading text, transparently un-gzipping *.gz"""
+    if file_path.endswith('.gz'):
+        return gzip.open(file_path, 'rt')
+    return open(file_path, 'r', buffering=READ_BUFFER_SIZE)
+
+def iter_lines(file_path, end=None):
+    """Yield stripped, non-empty lines of a statement file one at a time.
+
+    For plain-text files, end limits reading to the first end bytes so a
+    caller can pin the offset it will later tail from.
+    """
+    if file_path.endswith('.gz'):
+        with open_statement(file_path) as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield line
+        return
+
+    position = 0
+    with open(file_path, 'rb', buffering=READ_BUFFER_SIZE) as file:
+        for raw in file:
+            if end is not None:
+                if position >= end:
+                    break
+                raw = raw[:end - position]
+            position += len(raw)
+
+            line = raw.decode('utf-8').strip()
+            if line:
+                yield line
+
+def complete_end(file_path, size):
+    """Offset just past the last newline in the first size bytes of a
+    plain-text statement file, or 0 if there is none. A trailing line
+    without a newline may still be being written, so loading stops before
+    it, as read_appended_lines() does."""
+    with open(file_path, 'rb') as file:
+        end = size
+        while end > 0:
+            start = max(0, end - READ_BUFFER_SIZE)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b'\n')
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+def read_appended_lines(file_path, offset):
+    """Return (lines, new_offset) for the complete lines written after offset.
+
+    A trailing line without a newline is left for the next call, since the
+    writer may still be in the middle of it.
+    """
+    size = os.path.getsize(file_path)
+    if size <= offset:
+        return [], offset
+
+    with open(file_path, 'rb') as file:
+        file.seek(offset)
+        data = file.read(size - offset)
+
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return [], offset
+
+    lines = [line.strip() for line in data[:end].decode('utf-8').splitlines()]
+    return [line for line in lines if line], offset + end
+
+def parse_line(line):
+    """Parse a stripped ledger line into a LedgerRecord, or None if it is not one"""
+    match = LEDGER_LINE.match(line)
+    if match is None:
+        return None
+
+    label, record_id, date, description, amount = match.groups()
+    return LedgerRecord(RECORD_TYPES[label], record_id, date, description, int(amount), line)
+
+def parse_records(lines):
+    """Yield a LedgerRecord for every ledger line in lines, skipping the rest"""
+    for line in lines:
+        record = parse_line(line)
+        if record is not None:
+            yield record
+
+def iter_records(file_path):
+    """Stream the records of a statement file in constant memory"""
+    return parse_records(iter_lines(file_path))
@@ -0,0 +1,242 @@
+import os
+import json
+import numpy as np
+
+def grow(buffer, size):
+    """buffer, or a copy with room for at least size items; capacity at
+    least doubles so repeated appends stay amortized O(1)"""
+    if len(buffer) >= size:
+        return buffer
+    grown = np.empty(max(size, 2 * len(buffer)), dtype=buffer.dtype)
+    grown[:len(buffer)] = buffer
+    return grown
+
+def save_array(path, array):
+    """Atomically write an .npy file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.save(f, np.ascontiguousarray(array))
+    os.replace(tmp_path, path)
+
+def save_json(path, value):
+    """Atomically write a JSON file"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(value, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+class TextArena:
+    """Append-only list of strings held as UTF-8 in one byte buffer and
+    indexed by offsets, so a string costs its encoded length plus 8 bytes
+    instead of a Python object"""
+
+    def __init__(self, data=None, offsets=None):
+        self._data = np.zeros(0, dtype=np.uint8) if data is None else data
+        self._offsets = np.zeros(1, dtype=np.int64) if offsets is None else offsets
+        self._size = len(self._offsets) - 1
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("TextArena index out of range")
+        offsets = self._offsets
+        return self._data[offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield self[index]
+
+    @property
+    def offsets(self):
+        return self._offsets[:self._size + 1]
+
+    @property
+    def data(self):
+        return self._data[:self._offsets[self._size]]
+
+    def append(self, text):
+        """Add a string and return its index"""
+        return self.extend([text])
+
+    def extend(self, texts):
+        """Add strings and return the index of the first one"""
+        first = self._size
+        encoded = [text.encode('utf-8') for text in texts]
+        if not encoded:
+            return first
+
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        end = int(self._offsets[self._size])
+        self._offsets = grow(self._offsets, self._size + len(encoded) + 1)
+        np.cumsum(lengths, out=self._offsets[self._size + 1:self._size + len(encoded) + 1])
+        self._offsets[self._size + 1:self._size + len(encoded) + 1] += end
+
+        blob = b"".join(encoded)
+        self._data = grow(self._data, end + len(blob))
+        self._data[end:end + len(blob)] = np.frombuffer(blob, dtype=np.uint8)
+        self._size += len(encoded)
+        return first
+
+    def save(self, prefix):
+        save_array(f"{prefix}_text.npy", self.data)
+        save_array(f"{prefix}_offsets.npy", self.offsets)
+
+    @classmethod
+    def load(cls, prefix, mmap_mode='r'):
+        """Arena saved with save(); the text bytes are memory-mapped, so only
+        the strings that are read get paged in"""
+        data = np.load(f"{prefix}_text.npy", mmap_mode=mmap_mode)
+        offsets = np.load(f"{prefix}_offsets.npy")
+        if offsets.ndim != 1 or len(offsets) == 0 or offsets[-1] != len(data):
+            raise ValueError(f"Inconsistent text arena: {prefix}")
+        return cls(data, offsets)
+
+class EncodedStrings:
+    """Dictionary-encoded strings: an int32 code per row plus each distinct
+    value once. Suits ledger dates and descriptions, which repeat heavily."""
+
+    def __init__(self, values=()):
+        self.values = []
+        self._index = {}
+        self._codes = np.zeros(0, dtype=np.int32)
+        self._size = 0
+        self.extend(values)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError("EncodedStrings index out of range")
+        return self.values[self._codes[row]]
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes.tolist())
+
+    def tolist(self):
+        return list(self)
+
+    @classmethod
+    def from_codes(cls, codes, values):
+        """Column from existing codes into a list of distinct values"""
+        column = cls()
+        column.values = list(values)
+        column._index = {value: code for code, value in enumerate(column.values)}
+        if len(codes) and (codes.min() < 0 or codes.max() >= len(column.values)):
+            raise ValueError("Encoded strings: code out of range")
+        column._append_codes(np.asarray(codes, dtype=np.int32))
+        return column
+
+    @property
+    def codes(self):
+        return self._codes[:self._size]
+
+    def code(self, value):
+        """Code of value, adding it to the dictionary if new"""
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def append(self, value):
+        if self._size == len(self._codes):
+            self._codes = grow(self._codes, self._size + 1)
+        self._codes[self._size] = self.code(value)
+        self._size += 1
+
+    def extend(self, values):
+        if isinstance(values, EncodedStrings):
+            mapping = np.array([self.code(value) for value in values.values], dtype=np.int32)
+            codes = mapping[values.codes] if len(mapping) else values.codes
+        else:
+            codes = np.fromiter(map(self.code, values), dtype=np.int32)
+        self._append_codes(codes)
+
+    def _append_codes(self, codes):
+        self._codes = grow(self._codes, self._size + len(codes))
+        self._codes[self._size:self._size + len(codes)] = codes
+        self._size += len(codes)
+
+    def save(self, prefix):
+        save_array(f"{prefix}_codes.npy", self.codes)
+        arena = TextArena()
+        arena.extend(self.values)
+        arena.save(f"{prefix}_values")
+
+    @classmethod
+    def load(cls, prefix):
+        return cls.from_codes(np.load(f"{prefix}_codes.npy"), TextArena.load(f"{prefix}_values", mmap_mode=None))
+
+class FixedWidthStrings:
+    """Short strings such as record IDs in a NumPy bytes array, widened
+    when a longer value arrives. Being a plain array it can be sorted and
+    searched without creating Python objects."""
+
+    def __init__(self, values=()):
+        self._array = np.zeros(0, dtype='S1')
+        self._size = 0
+        self.extend(values)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError("FixedWidthStrings index out of range")
+        return self._array[row].decode('utf-8')
+
+    def __iter__(self):
+        return (value.decode('utf-8') for value in self.array.tolist())
+
+    def tolist(self):
+        return list(self)
+
+    @property
+    def array(self):
+        return self._array[:self._size]
+
+    def append(self, value):
+        self.extend([value])
+
+    def extend(self, values):
+        if isinstance(values, FixedWidthStrings):
+            new = values.array
+        else:
+            new = np.array([value.encode('utf-8') for value in values], dtype=bytes)
+        if len(new) == 0:
+            return
+        if new.dtype.itemsize > self._array.dtype.itemsize:
+            self._array = self._array.astype(new.dtype)
+        self._array = grow(self._array, self._size + len(new))
+        self._array[self._size:self._size + len(new)] = new
+        self._size += len(new)
+
+    def save(self, prefix):
+        save_array(f"{prefix}.npy", self.array)
+
+    @classmethod
+    def from_array(cls, array):
+        """Column over an existing NumPy bytes array, without copying it"""
+        if array.dtype.kind != 'S':
+            raise ValueError("Fixed-width strings need a bytes array")
+        column = cls()
+        column._array = array
+        column._size = len(array)
+        return column
+
+    @classmethod
+    def load(cls, prefix):
+        array = np.load(f"{prefix}.npy")
+        if array.dtype.kind != 'S':
+            raise ValueError(f"Inconsistent string column: {prefix}")
+        return cls.from_array(array)
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import threading
+
+METRIC_PREFIX = "finance_agent"
+
+# Upper bounds in seconds, from sub-millisecond intent parsing up to
+# multi-second recognition and speech synthesis
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Histogram:
+    """Latency histogram with Prometheus-style cumulative buckets"""
+
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(le, cumulative count)] including the +Inf bucket"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self):
+        return {
+            'buckets': {_format_bound(bound): count for bound, count in self.cumulative()},
+            'sum': self.sum,
+            'count': self.count
+        }
+
+def _format_bound(bound):
+    return "+Inf" if bound == float('inf') else repr(bound)
+
+class Trace:
+    """Stage durations, counts and attributes of one request"""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = dict(attributes)
+        self.stages = {}
+        self.counts = {}
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def to_dict(self):
+        return {
+            'type': 'trace',
+            'name': self.name,
+            'timestamp': self.timestamp,
+            'duration': self.duration,
+            'stages': self.stages,
+            'counts': self.counts,
+            'attributes': self.attributes
+        }
+
+class _Stage:
+    __slots__ = ('tracer', 'name', 'started')
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer.record(self.name, time.perf_counter() - self.started)
+
+class _TraceScope:
+    __slots__ = ('tracer', 'trace', 'previous')
+
+    def __init__(self, tracer, trace):
+        self.tracer = tracer
+        self.trace = trace
+
+    def __enter__(self):
+        local = self.tracer._local
+        self.previous = getattr(local, 'trace', None)
+        local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.tracer._local.trace = self.previous
+        self.trace.duration = time.perf_counter() - self.trace.started
+        if exc_type is not None:
+            self.trace.attributes['error'] = exc_type.__name__
+        self.tracer._finish(self.trace)
+
+class Tracer:
+    """Per-stage latency histograms and event counters for the pipeline.
+
+    Code times a stage with `with tracer.stage("encode"):` and counts events
+    (cache hits, chunk counts) with tracer.count(). Both always feed the
+    process-wide metrics; inside `with tracer.trace("voice_command"):` they
+    are also collected for that request, and the request is appended to
+    jsonl_path as one JSON line when the block exits. Traces are per
+    thread, so work handed to other threads (background synthesis, the
+    server's batch thread) only shows up in the metrics.
+
+    Metrics are exported with prometheus_text(), written to metrics_path
+    after every trace (in the format of node_exporter's textfile
+    collector), and appended to jsonl_path as a "metrics" line by flush().
+    """
+
+    enabled = True
+
+    def __init__(self, jsonl_path=None, metrics_path=None, buckets=STAGE_BUCKETS):
+        self.jsonl_path = jsonl_path
+        self.metrics_path = metrics_path
+        self.buckets = buckets
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+
+    def stage(self, name):
+        """Context manager that times one stage"""
+        return _Stage(self, name)
+
+    def record(self, name, seconds):
+        """Record a stage duration measured elsewhere"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds)
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.stages[name] = trace.stages.get(name, 0.0) + seconds
+
+    def count(self, name, amount=1):
+        """Add amount to an event counter, e.g. "answer_cache_hit" """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.counts[name] = trace.counts.get(name, 0) + amount
+
+    def annotate(self, **attributes):
+        """Attach attributes (e.g. the transcript or intent) to the current trace"""
+        trace = getattr(self._local, 'trace', None)
+        if trace is not None:
+            trace.attributes.update(attributes)
+
+    def trace(self, name, **attributes):
+        """Context manager collecting the stages of one request"""
+        return _TraceScope(self, Trace(name, attributes))
+
+    def _finish(self, trace):
+        if self.jsonl_path:
+            self._append_jsonl(trace.to_dict())
+        if self.metrics_path:
+            self.write_prometheus(self.metrics_path)
+
+    def _append_jsonl(self, entry):
+        line = json.dumps(entry) + "\n"
+        with self._write_lock:
+            with open(self.jsonl_path, "a") as f:
+                f.write(line)
+
+    def snapshot(self):
+        """Histograms and counters as plain dicts"""
+        with self._lock:
+            return {
+                'type': 'metrics',
+                'timestamp': time.time(),
+                'stages': {name: histogram.to_dict() for name, histogram in self._histograms.items()},
+                'counters': dict(self._counters)
+            }
+
+    def prometheus_text(self):
+        """Metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = [(name, histogram.cumulative(), histogram.sum, histogram.count)
+                          for name, histogram in sorted(self._histograms.items())]
+            counters = sorted(self._counters.items())
+
+        lines = [
+            f"# HELP {METRIC_PREFIX}_stage_seconds Time spent in each pipeline stage.",
+            f"# TYPE {METRIC_PREFIX}_stage_seconds histogram",
+        ]
+        for name, buckets, total, count in histograms:
+            for bound, cumulative in buckets:
+                lines.append(f'{METRIC_PREFIX}_stage_seconds_bucket{{stage="{name}",le="{_format_bound(bound)}"}} {cumulative}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_sum{{stage="{name}"}} {total}')
+            lines.append(f'{METRIC_PREFIX}_stage_seconds_count{{stage="{name}"}} {count}')
+
+        lines.append(f"# HELP {METRIC_PREFIX}_events_total Pipeline events such as cache hits and retrieved chunks.")
+        lines.append(f"# TYPE {METRIC_PREFIX}_events_total counter")
+        for name, value in counters:
+            lines.append(f'{METRIC_PREFIX}_events_total{{event="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write prometheus_text() to path"""
+        text = self.prometheus_text()
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._write_lock:
+            with open(tmp_path, "w") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+    def flush(self):
+        """Write the current metrics to the configured files"""
+        if self.jsonl_path:
+            self._append_jsonl(self.snapshot())
+        if self.metrics_path:
+            self.write_prometheus(self.metrics_path)
+
+class _NullScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+_NULL_SCOPE = _NullScope()
+
+class NullTracer:
+    """Tracer used when tracing is off: every call is a no-op, and stage()
+    and trace() return one shared do-nothing context manager"""
+
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_SCOPE
+
+    def record(self, name, seconds):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def annotate(self, **attributes):
+        pass
+
+    def trace(self, name, **attributes):
+        return _NULL_SCOPE
+
+    def snapshot(self):
+        return {'type': 'metrics', 'timestamp': time.time(), 'stages': {}, 'counters': {}}
+
+    def prometheus_text(self):
+        return ""
+
+    def flush(self):
+        pass
+
+def load_tracer(trace=None, metrics=None):
+    """Tracer for a FINANCE_AGENT_TRACE-style setting: unset, "" or "0" is
+    off, "1" keeps metrics in memory only, anything else is a JSONL path.
+    A metrics path (FINANCE_AGENT_METRICS) also turns tracing on."""
+    trace = os.environ.get("FINANCE_AGENT_TRACE", "") if trace is None else trace
+    metrics = os.environ.get("FINANCE_AGENT_METRICS", "") if metrics is None else metrics
+    if trace.lower() in ("", "0", "off", "false") and not metrics:
+        return NullTracer()
+    jsonl_path = None if trace.lower() in ("", "0", "off", "false", "1", "on", "true") else trace
+    return Tracer(jsonl_path=jsonl_path, metrics_path=metrics or None)
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+def get_tracer():
+    """Process-wide tracer configured from FINANCE_AGENT_TRACE and
+    FINANCE_AGENT_METRICS; metrics are flushed at exit"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                tracer = load_tracer()
+                if tracer.enabled:
+                    atexit.register(tracer.flush)
+                _tracer = tracer
+    return _tracer
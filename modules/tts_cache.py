@@ -0,0 +1,212 @@
+import os
+import hashlib
+import mimetypes
+import argparse
+import importlib
+import threading
+from io import BytesIO
+from modules.ledger import MONTHS
+from modules.tracing import get_tracer
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data/tts_cache")
+DEFAULT_MAX_BYTES = 64 << 20
+
+# Canonical questions whose answers are pre-rendered after each ingest; the
+# per-month ones are added for every month present in the ledger.
+SUMMARY_QUERIES = (
+    "what is the highest expense",
+    "what is the highest income",
+    "what is the most recent expense",
+    "what is the most recent income",
+    "total expenses",
+    "total income",
+    "what is my financial balance",
+)
+MONTHLY_SUMMARY_QUERIES = (
+    "expenses in {month}",
+    "income in {month}",
+    "net profit for {month}",
+    "financial summary for {month}",
+)
+
+class GTTSBackend:
+    """Synthesis backend using Google Text-to-Speech (needs network access)"""
+    suffix = ".mp3"
+
+    def __init__(self, lang="en"):
+        self.lang = lang
+        self.name = f"gtts:{lang}"
+
+    def synthesize(self, text):
+        from gtts import gTTS
+
+        audio = BytesIO()
+        gTTS(text=text, lang=self.lang).write_to_fp(audio)
+        return audio.getvalue()
+
+def load_backend(spec=None):
+    """Build a synthesis backend from "gtts" or "package.module:Factory".
+
+    Any object with name, suffix and synthesize(text) -> bytes works, so an
+    offline engine can stand in for gTTS. Defaults to FINANCE_AGENT_TTS_BACKEND.
+    """
+    spec = spec or os.environ.get("FINANCE_AGENT_TTS_BACKEND", "gtts")
+    if spec == "gtts":
+        return GTTSBackend()
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized speech.
+
+    Each distinct (backend, text) pair is synthesized once and stored under
+    the sha1 of both. Reading an entry refreshes its mtime, and once the
+    cache grows past max_bytes the least recently used files are evicted.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, backend=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.backend = backend or load_backend()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def mime_type(self):
+        """MIME type of the backend's audio files, from its suffix"""
+        return mimetypes.guess_type("audio" + self.backend.suffix)[0] or "application/octet-stream"
+
+    def key(self, text):
+        return hashlib.sha1(f"{self.backend.name}\0{text}".encode("utf-8")).hexdigest()
+
+    def path(self, text):
+        return os.path.join(self.cache_dir, self.key(text) + self.backend.suffix)
+
+    def audio_path(self, text):
+        """Path of the audio for text, synthesizing it on a miss"""
+        tracer = get_tracer()
+        path = self.path(text)
+        try:
+            os.utime(path)
+            self.hits += 1
+            tracer.count("tts_cache_hit")
+            return path
+        except FileNotFoundError:
+            pass
+
+        self.misses += 1
+        tracer.count("tts_cache_miss")
+        with tracer.stage("tts_synthesize"):
+            audio = self.backend.synthesize(text)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(audio)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += len(audio)
+            self._evict(keep=path)
+        return path
+
+    def audio_bytes(self, text):
+        """Audio for text as bytes, synthesizing it on a miss"""
+        with open(self.audio_path(text), "rb") as f:
+            return f.read()
+
+    def _evict(self, keep=None):
+        if self._size is not None and self._size <= self.max_bytes:
+            return
+
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.name.endswith(".tmp") or not entry.is_file():
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        self._size = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+    def prerender(self, texts):
+        """Synthesize every text that is not cached yet; returns how many were"""
+        rendered = 0
+        for text in dict.fromkeys(texts):
+            if not os.path.exists(self.path(text)):
+                self.audio_path(text)
+                rendered += 1
+        return rendered
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+_tts_cache = None
+_tts_cache_lock = threading.Lock()
+
+def get_tts_cache():
+    """Process-wide TTSCache with the default directory and backend"""
+    global _tts_cache
+    if _tts_cache is None:
+        with _tts_cache_lock:
+            if _tts_cache is None:
+                _tts_cache = TTSCache()
+    return _tts_cache
+
+def summary_queries(ledger):
+    """Canonical summary questions for the months present in the ledger"""
+    queries = list(SUMMARY_QUERIES)
+    multi_year = len(ledger.years()) > 1
+    for year, month in ledger.periods():
+        month_name = f"{MONTHS[month - 1]} {year}" if multi_year else MONTHS[month - 1]
+        queries.extend(query.format(month=month_name) for query in MONTHLY_SUMMARY_QUERIES)
+    return queries
+
+def prerender_summaries(engine, cache=None):
+    """Pre-render the spoken answers to the canonical summary questions"""
+    cache = cache or get_tts_cache()
+    return cache.prerender(engine.get_answers(summary_queries(engine.ledger)))
+
+def prerender_in_background(engine, cache=None):
+    """Run prerender_summaries() on a daemon thread and return the thread"""
+    def run():
+        try:
+            prerender_summaries(engine, cache)
+        except Exception as e:
+            print(f"Error pre-rendering speech: {e}")
+
+    thread = threading.Thread(target=run, name="tts-prerender", daemon=True)
+    thread.start()
+    return thread
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-render spoken answers to the canonical summary questions.")
+    parser.add_argument("--backend", help='"gtts" (default) or "package.module:Factory"')
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-bytes", type=int, default=DEFAULT_MAX_BYTES)
+    args = parser.parse_args()
+
+    from modules.rag_engine import initialize_rag
+
+    cache = TTSCache(args.cache_dir, load_backend(args.backend), args.max_bytes)
+    rendered = prerender_summaries(initialize_rag(), cache)
+    print(f"Pre-rendered {rendered} answers into {args.cache_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,31 @@
-import speech_recognition as sr
+from modules.recognizer import RecognitionError, load_recognizer, microphone_frames, transcribe_stream, SAMPLE_RATE
 
-def get_voice_command():
-    recognizer = sr.Recognizer()
-    with sr.Microphone() as source:
-        print("🎤 Listening for command...")
-        audio = recognizer.listen(source)
+_recognizer = None
+
+def get_voice_command(on_partial=None, vad=None):
+    """Capture one spoken command, ending when the speaker stops.
+
+    With a streaming recognizer, on_partial(text) receives the transcript
+    while the command is still being spoken. vad replaces the default
+    EnergyVAD, e.g. with a BargeInVAD while an answer is being spoken.
+    """
+    global _recognizer
 
     try:
-        command = recognizer.recognize_google(audio)
-        print(f"🗣️ You said: {command}")
-        return command
-    except sr.UnknownValueError:
-        print("❌ Sorry, I couldn't understand.")
-    except sr.RequestError as e:
-        print(f"⚠️ Error with service: {e}")
+        if _recognizer is None:
+            _recognizer = load_recognizer()
+        print("🎤 Listening for command...")
+        frames = microphone_frames(SAMPLE_RATE)
+        try:
+            command = transcribe_stream(_recognizer, frames, SAMPLE_RATE, vad=vad, on_partial=on_partial)
+        finally:
+            frames.close()
+    except RecognitionError as e:
+        print(f"⚠️ {e}")
+        return None
 
+    if not command:
+        print("❌ Sorry, I couldn't understand.")
+        return None
+    print(f"🗣️ You said: {command}")
+    return command
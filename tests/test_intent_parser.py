@@ -0,0 +1,19 @@
+from modules.intent_parser import classify
+
+def test_spending_over_a_window_asks_for_expenses():
+    intent = classify("how much did I spend in the last 30 days")
+    assert (intent.query, intent.entity, intent.measure, intent.days) == ("expenses in the last 30 days", "expense", "period", 30)
+    assert classify("what did I spend in the past 2 weeks").query == "expenses in the last 14 days"
+
+def test_spending_on_an_item_is_retrieved():
+    intent = classify("how much did I spend on software subscriptions")
+    assert (intent.entity, intent.measure) == ("expense", None)
+
+def test_window_with_only_summary_words_is_retrieved():
+    for text in ("show me the last 30 days", "give me the total for the last 7 days"):
+        intent = classify(text)
+        assert (intent.query, intent.measure, intent.days) == (text, None, int(text.split()[-2]))
+
+def test_bare_window_asks_for_net():
+    intent = classify("last 30 days")
+    assert (intent.query, intent.measure, intent.days) == ("net profit for the last 30 days", "net", 30)
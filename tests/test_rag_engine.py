@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from modules.rag_engine import RAGEngine
+
+def test_refresh_completes_a_line_caught_mid_write(tmp_path):
+    path = tmp_path / "statements.txt"
+    path.write_text("Invoice #001 | January 05, 2024 | Office Rent | $550\n"
+                    "Invoice #002 | January 06, 2024 | Desk | $12")
+    engine = RAGEngine(str(path), index_dir=str(tmp_path / "index"))
+    assert engine.get_answer("total expenses") == "Total expenses: $550."
+
+    with open(path, "a") as file:
+        file.write("00\n")
+    assert engine.refresh() == 1
+
+    rebuilt = RAGEngine(str(path), force_reload=True, index_dir=str(tmp_path / "rebuilt"))
+    assert engine.get_answer("total expenses") == rebuilt.get_answer("total expenses") == "Total expenses: $1750."
@@ -0,0 +1,66 @@
+import os
+import numpy as np
+from modules import recognizer as recognizer_module
+from modules.recognizer import BargeInVAD, load_recognizer, transcribe_stream, transcribe_wav, wav_frames
+
+# 8 kHz mono: 0.3 s silence, 0.3 s loud tone, a 0.9 s pause, 0.3 s of a tone
+# below EnergyVAD's min_rms, then 0.2 s silence
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "pause_then_quiet.wav")
+
+class StubRecognizer:
+    """Recognizer whose "model" says "loud" or "quiet" for each burst of
+    sound, judged by frame RMS"""
+
+    def __init__(self):
+        self.sample_rates = []
+
+    def session(self, sample_rate):
+        self.sample_rates.append(sample_rate)
+        return StubSession()
+
+class StubSession:
+    def __init__(self):
+        self.words = []
+        self.in_word = False
+
+    def accept(self, frame):
+        samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        rms = float(np.sqrt(np.mean(samples * samples))) if len(samples) else 0.0
+        voiced = rms > 50
+        if voiced and not self.in_word:
+            self.words.append("loud" if rms > 1000 else "quiet")
+        self.in_word = voiced
+        return " ".join(self.words)
+
+    def finish(self):
+        return " ".join(self.words)
+
+def test_transcribe_wav_keeps_pauses_and_quiet_speech():
+    recognizer = StubRecognizer()
+    partials = []
+
+    assert transcribe_wav(recognizer, FIXTURE, on_partial=partials.append) == "loud quiet"
+    assert partials == ["loud", "loud quiet"]
+    assert recognizer.sample_rates == [8000]
+
+def test_live_capture_stops_at_the_pause():
+    sample_rate, frames = wav_frames(FIXTURE)
+    assert transcribe_stream(StubRecognizer(), frames, sample_rate) == "loud"
+
+def test_playback_needs_louder_speech_to_barge_in():
+    sample_rate, frames = wav_frames(FIXTURE)
+    vad = BargeInVAD(lambda: True, barge_in_rms=10000)
+    assert transcribe_stream(StubRecognizer(), frames, sample_rate, vad=vad) == ""
+
+    sample_rate, frames = wav_frames(FIXTURE)
+    vad = BargeInVAD(lambda: True, barge_in_rms=3000)
+    assert transcribe_stream(StubRecognizer(), frames, sample_rate, vad=vad) == "loud"
+
+def test_vosk_model_setting_selects_the_offline_recognizer(monkeypatch):
+    monkeypatch.setattr(recognizer_module, "VoskRecognizer", lambda model_path: ("vosk", model_path))
+    monkeypatch.delenv("FINANCE_AGENT_ASR", raising=False)
+    monkeypatch.setenv("FINANCE_AGENT_VOSK_MODEL", "/models/vosk-small-en")
+    assert load_recognizer() == ("vosk", "/models/vosk-small-en")
+
+    monkeypatch.setenv("FINANCE_AGENT_ASR", "vosk:/models/other")
+    assert load_recognizer() == ("vosk", "/models/other")
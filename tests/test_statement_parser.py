@@ -0,0 +1,17 @@
+from modules.statement_parser import complete_end, read_appended_lines
+
+def test_complete_end_stops_before_an_unfinished_line(tmp_path):
+    path = tmp_path / "statements.txt"
+    path.write_bytes(b"Invoice #001 | January 05, 2024 | Office Rent | $550\nInvoice #002 | January 06, 2024 | Desk | $12")
+
+    end = complete_end(str(path), path.stat().st_size)
+    assert end == len(b"Invoice #001 | January 05, 2024 | Office Rent | $550\n")
+
+    with open(path, "ab") as file:
+        file.write(b"00\n")
+    assert read_appended_lines(str(path), end) == (["Invoice #002 | January 06, 2024 | Desk | $1200"], path.stat().st_size)
+
+def test_complete_end_without_a_newline(tmp_path):
+    path = tmp_path / "statements.txt"
+    path.write_bytes(b"Invoice #001 | January 05, 2024 | Office Rent | $5")
+    assert complete_end(str(path), path.stat().st_size) == 0
@@ -0,0 +1,48 @@
+import os
+from modules.tts_cache import TTSCache
+
+class StubBackend:
+    """Synthesizes 100 bytes per text and records what it was asked for"""
+    name = "stub"
+    suffix = ".wav"
+
+    def __init__(self):
+        self.calls = []
+
+    def synthesize(self, text):
+        self.calls.append(text)
+        return text.encode("utf-8").ljust(100, b"\0")
+
+def test_miss_synthesizes_once_then_hits(tmp_path):
+    backend = StubBackend()
+    cache = TTSCache(str(tmp_path), backend)
+
+    path = cache.audio_path("Total income: $60270.")
+    assert cache.audio_path("Total income: $60270.") == path
+    assert cache.audio_bytes("Total income: $60270.").startswith(b"Total income")
+
+    assert backend.calls == ["Total income: $60270."]
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3}
+
+def test_evicts_least_recently_used(tmp_path):
+    backend = StubBackend()
+    cache = TTSCache(str(tmp_path), backend, max_bytes=250)
+    first = cache.audio_path("first")
+    second = cache.audio_path("second")
+    os.utime(first, ns=(1, 1))
+    os.utime(second, ns=(2, 2))
+
+    # Reading first makes second the least recently used entry
+    cache.audio_path("first")
+    third = cache.audio_path("third")
+
+    assert os.path.exists(first)
+    assert not os.path.exists(second)
+    assert os.path.exists(third)
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(path) for path in (first, third))
+
+def test_mime_type_follows_the_backend_suffix(tmp_path):
+    backend = StubBackend()
+    assert TTSCache(str(tmp_path), backend).mime_type in ("audio/wav", "audio/x-wav")
+    backend.suffix = ".mp3"
+    assert TTSCache(str(tmp_path), backend).mime_type == "audio/mpeg"